@@ -1,12 +1,18 @@
 import typer
 import time
-from typing import Optional
+from typing import List, Optional
 from pathlib import Path
 
-from avbot.lib.screen import WoWclient
-from avbot.lib.movements import moves
-from avbot.lib.battlegrounds import afk_bg
-from avbot.lib.fused_wiring import farm_fused_wiring
+from avbot.constants import (
+    CAPTURE_FPS,
+    LOOP_TICK_RATE,
+    PROBES_PATH,
+    TEMPLATE_BUNDLE_PATH,
+)
+
+# Commands import the subsystems they use when they run, so that --help and the
+# lighter commands do not pay for the capture and matching stack.
+# See benchmarks/bench_import.py
 
 # Create the app correctly - this is what the CLI will use
 app = typer.Typer(help="Automated World of Warcraft battleground bot")
@@ -49,6 +55,31 @@ def afk_av(
         "-w",
         help="Maximum wait time in seconds for battleground queue",
     ),
+    capture_fps: float = typer.Option(
+        0.0,
+        "--capture-fps",
+        help=f"Background screen capture rate, e.g. {CAPTURE_FPS:g}, 0 to capture on demand",
+    ),
+    pyramid_levels: int = typer.Option(
+        0,
+        "--pyramid-levels",
+        help="Coarse to fine matching levels, 0 for an exhaustive search",
+    ),
+    ui_scale: float = typer.Option(
+        1.0,
+        "--ui-scale",
+        help="In-game UI scale relative to the one the templates were captured with",
+    ),
+    tick_rate: float = typer.Option(
+        LOOP_TICK_RATE,
+        "--tick-rate",
+        help="Battleground loop iterations per second right after a state change",
+    ),
+    cpu_budget: Optional[float] = typer.Option(
+        None,
+        "--cpu-budget",
+        help="Max share of one CPU core used by the battleground loop, e.g. 0.25",
+    ),
 ):
     """
     Run the Alterac Valley AFK farming bot.
@@ -57,10 +88,12 @@ def afk_av(
     enter when the queue pops, and perform necessary movements to avoid
     AFK detection while farming honor/marks.
     """
+    from avbot.lib.screen import WoWclient
+    from avbot.lib.battlegrounds import afk_bg
 
     # Initialize the WoW client
     typer.echo(f"Initializing WoW client...")
-    wow_client = WoWclient()
+    wow_client = WoWclient(pyramid_levels=pyramid_levels, ui_scale=ui_scale)
 
     # Find and update client screen
     typer.echo(f"Detecting WoW window...")
@@ -69,8 +102,12 @@ def afk_av(
 
     # Load images and keystrokes
     typer.echo(f"Loading recognition images and keystroke patterns...")
-    wow_client.load_sub_images()
+    wow_client.load_sub_images(bundle_path=TEMPLATE_BUNDLE_PATH)
     wow_client.load_movements()
+    wow_client.load_calibration()
+    wow_client.load_probes()
+    if capture_fps > 0:
+        wow_client.start_capture(capture_fps)
 
     # Start the bot
     typer.echo(f"Starting AFK bot for {games} battlegrounds...")
@@ -83,11 +120,16 @@ def afk_av(
             mount_key=mount_key,
             threshold=threshold,
             max_wait_time=max_wait_time,
+            tick_rate=tick_rate,
+            cpu_budget=cpu_budget,
         )
         typer.echo(f"✅ Bot routine completed successfully!")
     except Exception as e:
         typer.echo(f"❌ Error: {str(e)}")
         raise typer.Exit(code=1)
+    finally:
+        wow_client.save_calibration()
+        wow_client.close()
 
 
 @app.command("farm-fused-wiring")
@@ -108,12 +150,15 @@ def farm_wiring(
     """
     Uses then loots target dummies in order to farm fused wiring.
     """
-    wow_client = WoWclient()
-    wow_client.find_screen()
-    wow_client.load_sub_images()
-    wow_client.focus_client()
+    from avbot.lib.screen import WoWclient
+    from avbot.lib.fused_wiring import farm_fused_wiring
 
-    farm_fused_wiring(wow_client, target_dummy_key=dummy_key, n=dummies)
+    with WoWclient() as wow_client:
+        wow_client.find_screen()
+        wow_client.load_sub_images()
+        wow_client.focus_client()
+
+        farm_fused_wiring(wow_client, target_dummy_key=dummy_key, n=dummies)
     typer.echo(f"✅ Used and looted {dummies} target dummies.")
 
 
@@ -135,26 +180,105 @@ def save_screen(
     """
     Saves a WoW screenshot using the currently open WoW client.
     """
+    # Only the window and capture modules, the matching stack is not needed here
+    from avbot.lib.capture import CaptureEngine
+    from avbot.lib.utils import get_mss_region
+    from avbot.lib.window import WoWcoordinates
+
     # Use current timestamp if no filename is provided
     file_name = file_name if file_name else f"{int(time.time())}"
     file_name = file_name.split(".")[0]
     file_path = Path(folder_path) / f"{file_name}.png"
 
-    # Initialize the WoW client
-    typer.echo(f"Initializing WoW client...")
-    wow_client = WoWclient()
-
-    # Find and update client screen
+    # Find the WoW window
     typer.echo(f"Detecting WoW window...")
-    wow_client.find_screen()
-    wow_client.update_client_image()
+    wow_coordinates = WoWcoordinates()
+    wow_coordinates.update_coordinates()
+
+    # Capture the client window, like WoWclient does in window capture mode
+    with CaptureEngine() as engine:
+        image = engine.grab_frame(get_mss_region(wow_coordinates.bbox)).to_pil()
 
     # Save image
     typer.echo(f"Saving screenshot...")
-    wow_client.image.save(file_path)
+    image.save(file_path)
     typer.echo(f"✅ File saved at: {file_path}")
 
 
+@app.command("calibrate-probe")
+def calibrate_probe(
+    image_path: Path = typer.Option(
+        ...,
+        "--image",
+        "-i",
+        help="Screenshot of the client in which the element is visible",
+    ),
+    names: List[str] = typer.Option(
+        ...,
+        "--name",
+        "-n",
+        help="Sub-image to build a pixel probe for, can be repeated",
+    ),
+    threshold: float = typer.Option(
+        0.75,
+        "--threshold",
+        help="Image recognition matching threshold (0.0-1.0)",
+    ),
+):
+    """
+    Calibrates pixel probes from a reference screenshot.
+
+    The screenshot must be a full client capture, e.g. one taken with save-screen.
+    """
+    from PIL import Image
+    from avbot.lib.screen import WoWclient, WoWcoordinates
+    from avbot.lib.utils import BBox, Location
+
+    image = Image.open(image_path)
+    wow_client = WoWclient(
+        wow_coordinates=WoWcoordinates(
+            bbox=BBox(0, 0, *image.size), location=Location(0, 0, *image.size)
+        ),
+        image=image,
+    )
+    wow_client.load_sub_images()
+    wow_client.load_probes()
+
+    for name in names:
+        probe = wow_client.calibrate_probe(
+            name, threshold=threshold, frame=wow_client.get_frame()
+        )
+        if probe is None:
+            typer.echo(f"❌ {name} was not found in {image_path}")
+            raise typer.Exit(code=1)
+        typer.echo(f"Calibrated {name} with {len(probe.points)} points")
+
+    wow_client.save_probes()
+    typer.echo(f"✅ Probes saved at: {PROBES_PATH}")
+
+
+@app.command("build-templates")
+def build_templates(
+    bundle_path: Path = typer.Option(
+        TEMPLATE_BUNDLE_PATH,
+        "--output",
+        "-o",
+        help="Where to write the template bundle",
+    ),
+):
+    """
+    Precompiles the recognition images into a memory-mapped bundle.
+
+    afk-av rebuilds the bundle on its own when an image changes, this command
+    does it ahead of time.
+    """
+    from avbot.lib.templates import build_template_bundle
+
+    data_dir = Path(__file__).parent / "data"
+    bundle = build_template_bundle(data_dir, bundle_path)
+    typer.echo(f"✅ Bundled {len(bundle.templates)} templates at: {bundle_path}")
+
+
 @app.command("move")
 def move_character(
     units: float = typer.Option(
@@ -197,14 +321,15 @@ def move_character(
     """
     Moves your character.
     """
-    # Initialize the WoW client
-    typer.echo(f"Initializing WoW client...")
-    wow_client = WoWclient()
+    # Moving only needs the window, not the capture and matching stack
+    from avbot.lib.window import WoWcoordinates
+    from avbot.lib.movements import moves
 
-    # Find and update client screen
+    # Find the WoW window
     typer.echo(f"Detecting WoW window...")
-    wow_client.find_screen()
-    wow_client.focus_client()
+    wow_coordinates = WoWcoordinates()
+    wow_coordinates.update_coordinates()
+    wow_coordinates.focus()
 
     # Move
     moves(
@@ -1,3 +1,6 @@
+import os
+from pathlib import Path
+
 TURN_360 = 1.9
 TURN_90_FACTOR = 0.85
 TURN_180_FACTOR = 0.92
@@ -9,3 +12,75 @@ TURN_270_MOVING_FACTOR = 1.325
 TURN_360_MOVING_FACTOR = 1.325
 
 W_SPEED = 4.75
+
+# Detectors evaluated within this many seconds share a single capture
+FRAME_MAX_AGE = 0.1
+
+# Frames per second of the background capture thread
+CAPTURE_FPS = 20.0
+
+# Seconds between checks that the client window did not move or get resized
+WINDOW_CHECK_INTERVAL = 1.0
+
+# Pixels added around the last known location of a template before searching it
+HOT_REGION_PADDING = 40
+
+# Per-user files (calibration, caches)
+AVBOT_HOME = Path.home() / ".avbot"
+CALIBRATION_PATH = AVBOT_HOME / "hot_regions.json"
+
+# Threads used to match several templates against the same frame
+MATCH_WORKERS = min(8, os.cpu_count() or 1)
+
+# Coarse to fine matching: the smallest template side kept in a pyramid, the
+# number of coarse candidates refined, and how far below the threshold coarse
+# candidates may score
+PYRAMID_LEVELS = 2
+PYRAMID_MIN_TEMPLATE_SIZE = 8
+PYRAMID_CANDIDATES = 3
+PYRAMID_COARSE_MARGIN = 0.2
+
+# Templates in avbot/data were captured on a client this many pixels high, and
+# are rescaled for other clients when the scale differs by more than the tolerance
+REFERENCE_CLIENT_HEIGHT = 1440
+TEMPLATE_SCALE_TOLERANCE = 0.02
+TEMPLATE_CACHE_DIR = AVBOT_HOME / "templates"
+
+# Templates precompiled into a single memory-mapped file, see build-templates
+TEMPLATE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+TEMPLATE_BUNDLE_PATH = AVBOT_HOME / "templates.bundle"
+
+# Change gating: frames are compared on a grid of cells this many pixels wide, and
+# a region is unchanged while no cell mean moves by more than the tolerance
+GATE_CELL_SIZE = 16
+GATE_TOLERANCE = 4
+
+# Pixel probes: points sampled on a grid x grid lattice inside the element, and the
+# max per-channel color difference for a point to match
+PROBE_GRID = 3
+PROBE_TOLERANCE = 24
+PROBES_PATH = AVBOT_HOME / "probes.json"
+
+# Seconds between two stop condition checks while moving, with templates or probes
+DEATH_CHECK_INTERVAL = 0.25
+PROBE_CHECK_INTERVAL = 0.05
+
+# Default seconds between two evaluations of a scheduled detector, and the one
+# used while waiting in the battleground queue
+DETECTOR_INTERVAL = 0.5
+QUEUE_CHECK_INTERVAL = 2.0
+
+# Battleground loop pacing: target ticks per second, growth of the pause while
+# the state is stable, and the longest pause between two ticks
+LOOP_TICK_RATE = 4.0
+LOOP_BACKOFF = 1.5
+LOOP_MAX_INTERVAL = 2.0
+
+# Timed key events: sleep until this many seconds before their deadline, then spin
+TIMELINE_SPIN = 0.002
+# Latest event jitters kept for percentiles, counts and extremes cover every event
+TIMELINE_JITTER_SAMPLES = 1000
+
+# Seconds to keep looking for the leave battleground button, the game ports players
+# out of a finished battleground on its own after two minutes
+LEAVE_TIMEOUT = 130.0
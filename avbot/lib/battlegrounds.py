@@ -1,7 +1,12 @@
 import time
 import random
 import pyautogui
+from typing import Callable, Dict, Optional
+
 from avbot.lib.screen import WoWclient
+from avbot.lib.governor import LoopGovernor
+from avbot.lib.scheduler import APPEAR, DISAPPEAR
+from avbot.constants import LEAVE_TIMEOUT, LOOP_TICK_RATE, QUEUE_CHECK_INTERVAL
 
 from avbot.lib.movements import move_until_death, mount_up, move_randomly_in_bg
 from avbot.lib.utils import (
@@ -9,6 +14,17 @@ from avbot.lib.utils import (
     clear_keys,
 )
 
+# Battleground states, see BattlegroundStateMachine
+QUEUEING = "queueing"
+WAITING_FOR_GATES = "waiting_for_gates"
+TRAVELING = "traveling"
+ROAMING = "roaming"
+DEAD = "dead"
+ENDED = "ended"
+
+# States in which the death and end of game detectors are evaluated
+IN_BATTLEGROUND = (WAITING_FOR_GATES, TRAVELING, ROAMING, DEAD)
+
 
 def queue_and_enter_av(
     client: WoWclient,
@@ -52,7 +68,7 @@ def queue_and_enter_av(
         pyautogui.press("enter")
 
         # Update the chat typing box location - it should be gone
-        chat_typing_box.update_location(client, threshold, grayscale)
+        chat_typing_box.update_location(client, threshold, grayscale, max_age=0)
         if chat_typing_box.found:
             print("Warning: Chat typing box still visible after targeting")
     else:
@@ -61,7 +77,7 @@ def queue_and_enter_av(
         time.sleep(0.5)  # Brief delay to ensure the chat opens
 
         # Verify that the chat typing box is now visible
-        chat_typing_box.update_location(client, threshold, grayscale)
+        chat_typing_box.update_location(client, threshold, grayscale, max_age=0)
         if not chat_typing_box.found:
             print("Error: Chat typing box not found after pressing enter")
             return False
@@ -75,7 +91,7 @@ def queue_and_enter_av(
         pyautogui.press("enter")
 
         # Update the chat typing box location - it should be gone
-        chat_typing_box.update_location(client, threshold, grayscale)
+        chat_typing_box.update_location(client, threshold, grayscale, max_age=0)
         if chat_typing_box.found:
             print("Warning: Chat typing box still visible after targeting")
 
@@ -88,7 +104,7 @@ def queue_and_enter_av(
 
     # Check for battleground queue confirmation
     queue_for_battleground = client.get_sub_image("queue_for_battleground")
-    queue_for_battleground.update_location(client, threshold, grayscale)
+    queue_for_battleground.update_location(client, threshold, grayscale, max_age=0)
     if queue_for_battleground.found:
         move_mouse_to_bbox(queue_for_battleground.absolute_bbox)
         print("Successfully opened dialog box")
@@ -98,7 +114,7 @@ def queue_and_enter_av(
         return False
 
     join_battle = client.get_sub_image("join_battle")
-    join_battle.update_location(client, threshold, grayscale)
+    join_battle.update_location(client, threshold, grayscale, max_age=0)
     if join_battle.found:
         move_mouse_to_bbox(join_battle.absolute_bbox)
         print("Successfully queued for battleground")
@@ -107,22 +123,30 @@ def queue_and_enter_av(
         print("Warning: Queue confirmation dialog not found")
         return False
 
-    enter_battle = client.get_sub_image("enter_battle")
-    enter_battle.update_location(client, threshold, grayscale)
-
     # Check for "enter battle" button and click it when it appears
     print(f"Waiting up to {max_wait_time} seconds for the battleground to pop...")
-    start_time = time.time()
-    while time.time() - start_time < max_wait_time:
-        enter_battle.update_location(client, threshold, grayscale)
-        if enter_battle.found:
-            move_mouse_to_bbox(enter_battle.absolute_bbox)
-            print("Entering battleground")
-            return True
-        time.sleep(2)
+    popped = client.get_scheduler().wait_for(
+        "enter_battle",
+        APPEAR,
+        timeout=max_wait_time,
+        interval=QUEUE_CHECK_INTERVAL,
+        threshold=threshold,
+        grayscale=grayscale,
+    )
+    if not popped:
+        print("Timed out waiting for enter battle prompt")
+        return False
 
-    print("Timed out waiting for enter battle prompt")
-    return False
+    # A pixel probe may have spotted it, match the button to know where to click
+    enter_battle = client.get_sub_image("enter_battle")
+    enter_battle.update_location(client, threshold, grayscale)
+    if not enter_battle.found:
+        print("Warning: Enter battle prompt could not be located")
+        return False
+
+    move_mouse_to_bbox(enter_battle.absolute_bbox)
+    print("Entering battleground")
+    return True
 
 
 def walk_out_and_mount(
@@ -169,6 +193,248 @@ def walk_out_and_mount(
     return True
 
 
+class BattlegroundStateMachine:
+    """
+    Plays Alterac Valley games as an explicit state machine.
+
+    Each tick takes at most one snapshot and evaluates the death and end of game
+    detectors on it. Those results decide the transitions, otherwise the handler
+    of the current state runs its action and returns the next state. Time spent
+    in each state is accumulated to measure throughput.
+    """
+
+    def __init__(
+        self,
+        client: WoWclient,
+        n: int = 30,
+        target_name: str = "Thelman Slatefist",
+        interact_with_target_key: str = "/",
+        mount_key: str = "t",
+        move_forward_key="w",
+        turn_left_key: str = "[",
+        turn_right_key: str = "]",
+        threshold: float = 0.75,
+        grayscale: bool = True,
+        max_wait_time: int = 400,
+        n_movements: Optional[int] = None,
+        tick_rate: float = LOOP_TICK_RATE,
+        cpu_budget: Optional[float] = None,
+    ):
+        self.client = client
+        self.n = n
+        self.target_name = target_name
+        self.interact_with_target_key = interact_with_target_key
+        self.mount_key = mount_key
+        self.move_forward_key = move_forward_key
+        self.turn_left_key = turn_left_key
+        self.turn_right_key = turn_right_key
+        self.threshold = threshold
+        self.grayscale = grayscale
+        self.max_wait_time = max_wait_time
+        self.n_movements = n_movements
+        self.governor = LoopGovernor(tick_rate, cpu_budget)
+
+        self.state = QUEUEING
+        self.games = 0
+        self.started_at = time.monotonic()
+        self.entered_at = self.started_at
+        self.gates_open_at = 0.0
+        self.state_times: Dict[str, float] = {}
+        self.state_entries: Dict[str, int] = {QUEUEING: 1}
+        # Rate of the background capture paused while queueing
+        self.capture_fps: Optional[float] = None
+        self.handlers: Dict[str, Callable[[Dict[str, bool]], str]] = {
+            QUEUEING: self.queue,
+            WAITING_FOR_GATES: self.wait_for_gates,
+            TRAVELING: self.travel,
+            ROAMING: self.roam,
+            DEAD: self.wait_for_resurrection,
+            ENDED: self.leave,
+        }
+
+    def __repr__(self):
+        return (
+            f"BattlegroundStateMachine | State: {self.state}"
+            f" | Games: {self.games}/{self.n}"
+        )
+
+    @property
+    def finished(self) -> bool:
+        return self.games >= self.n
+
+    def time_in(self, state: str) -> float:
+        """Seconds spent in a state so far, including the current stay"""
+        elapsed = self.state_times.get(state, 0.0)
+        if state == self.state:
+            elapsed += time.monotonic() - self.entered_at
+        return elapsed
+
+    def report(self) -> str:
+        """Time spent per state and games per hour"""
+        total = time.monotonic() - self.started_at
+        lines = [
+            f"{state:>18}: {self.time_in(state):8.1f} s"
+            f" ({self.time_in(state) / total:.0%}, {self.state_entries.get(state, 0)}x)"
+            for state in self.handlers
+        ]
+        lines.append(f"Games per hour: {3600 * self.games / total:.2f}")
+        lines.append(str(self.governor))
+        return "\n".join(lines)
+
+    def set_state(self, state: str):
+        if state == self.state:
+            return
+
+        now = time.monotonic()
+        elapsed = now - self.entered_at
+        self.state_times[self.state] = self.state_times.get(self.state, 0.0) + elapsed
+        self.state_entries[state] = self.state_entries.get(state, 0) + 1
+        print(f"Info: {self.state} -> {state} after {elapsed:.1f} s")
+
+        self.state = state
+        self.entered_at = now
+        if state == WAITING_FOR_GATES:
+            self.gates_open_at = now + random.uniform(115, 120)
+        self.update_capture()
+
+    def update_capture(self):
+        """Pause the background capture while queueing, where nothing polls fast"""
+        capture_thread = self.client.capture_thread
+        if self.state == QUEUEING:
+            if capture_thread is not None and capture_thread.running:
+                self.capture_fps = capture_thread.fps
+                self.client.stop_capture()
+        elif self.capture_fps:
+            self.client.start_capture(self.capture_fps)
+            self.capture_fps = None
+
+    def observe(self) -> Dict[str, bool]:
+        """One capture and one batch of detections, outside of the battleground none"""
+        if self.state not in IN_BATTLEGROUND:
+            return {}
+        return self.client.get_scheduler().check(
+            ["leave_battleground", "cancel_res"], self.threshold, self.grayscale
+        )
+
+    def transition(self, status: Dict[str, bool]) -> Optional[str]:
+        """The state the detections force, if any"""
+        if not status:
+            return None
+
+        if status["leave_battleground"] and not status["cancel_res"]:
+            return ENDED
+        if status["cancel_res"] and not status["leave_battleground"]:
+            return DEAD
+        return None
+
+    def tick(self):
+        status = self.observe()
+        forced_state = self.transition(status)
+        if forced_state is not None and forced_state != self.state:
+            # The action of the new state runs on the next, fresh, snapshot
+            self.set_state(forced_state)
+        else:
+            self.set_state(self.handlers[self.state](status))
+
+        # Pace the loop, right away after the state changed
+        self.governor.wait(self.state)
+
+    def run(self):
+        self.governor.reset()
+        self.update_capture()
+        while not self.finished:
+            self.tick()
+
+        print(f"Info: Completed {self.games} battlegrounds\n{self.report()}")
+
+    def move(self, movements) -> bool:
+        return move_until_death(
+            self.client,
+            movements,
+            self.move_forward_key,
+            self.turn_left_key,
+            self.turn_right_key,
+            self.threshold,
+            self.grayscale,
+        )
+
+    def queue(self, status: Dict[str, bool]) -> str:
+        entered = queue_and_enter_av(
+            self.client,
+            self.target_name,
+            self.interact_with_target_key,
+            self.threshold,
+            self.grayscale,
+            self.max_wait_time,
+        )
+        return WAITING_FOR_GATES if entered else QUEUEING
+
+    def wait_for_gates(self, status: Dict[str, bool]) -> str:
+        if time.monotonic() < self.gates_open_at:
+            return WAITING_FOR_GATES
+        return TRAVELING
+
+    def travel(self, status: Dict[str, bool]) -> str:
+        # Walk out of the cave, then ride to the initial spot
+        if self.move(self.client.movements.get("move_out_of_cave")):
+            mount_up(self.client, self.mount_key, threshold=0.75)
+            self.move(self.client.movements.get("move_to_harpies"))
+        return ROAMING
+
+    def roam(self, status: Dict[str, bool]) -> str:
+        # Mount up if not already mounted, then roam until dead or the game ends,
+        # or for n_movements movements if set
+        mount_up(self.client, self.mount_key, self.threshold, self.grayscale)
+        move_randomly_in_bg(
+            self.client,
+            self.n_movements,
+            self.move_forward_key,
+            self.turn_left_key,
+            self.turn_right_key,
+            self.threshold,
+            self.grayscale,
+        )
+        return ROAMING
+
+    def wait_for_resurrection(self, status: Dict[str, bool]) -> str:
+        clear_keys()
+        if status["cancel_res"]:
+            # Wait for the resurrection rather than a fixed delay
+            self.client.get_scheduler().wait_for(
+                "cancel_res",
+                DISAPPEAR,
+                timeout=5,
+                threshold=self.threshold,
+                grayscale=self.grayscale,
+            )
+            return DEAD
+
+        # Move 100 units away from the graveyard in a straight line after being resurrected
+        self.move([{"units": 100, "rotation": 0.0}])
+        return ROAMING
+
+    def leave(self, status: Dict[str, bool]) -> str:
+        clear_keys()
+        print("Info: AV battle is over. Leaving battleground...")
+        # A pixel probe may have spotted the button, match it before clicking
+        leave_battleground = self.client.get_sub_image("leave_battleground")
+        leave_battleground.update_location(self.client, self.threshold, self.grayscale)
+        if leave_battleground.found:
+            move_mouse_to_bbox(leave_battleground.absolute_bbox)
+        elif time.monotonic() - self.entered_at < LEAVE_TIMEOUT:
+            # Try again on the next tick
+            print("Warning: Leave battleground button not found")
+            return ENDED
+        else:
+            print("Warning: Leave battleground button not found, assuming ported out")
+
+        self.games += 1
+        print(f"Complete battleground #{self.games}. Good work!")
+        print(f"Info: Time per state\n{self.report()}")
+        time.sleep(random.uniform(10, 15))
+        return QUEUEING
+
+
 def afk_bg(
     client: WoWclient,
     n: int = 30,
@@ -181,6 +447,8 @@ def afk_bg(
     threshold: float = 0.75,
     grayscale: bool = True,
     max_wait_time: int = 400,
+    tick_rate: float = LOOP_TICK_RATE,
+    cpu_budget: Optional[float] = None,
 ) -> bool:
     """
     Queue for Alterac Valley battleground and enter it by targeting and interacting with an NPC
@@ -197,105 +465,30 @@ def afk_bg(
         threshold (float): The matching threshold for image recognition
         grayscale (bool): Whether to use grayscale for image recognition
         max_wait_time (int): Max wait time in seconds for a queue
+        tick_rate (float): Target battleground loop iterations per second
+        cpu_budget (Optional[float]): Max share of one core used by the loop
     """
     client.focus_client()
     clear_keys()
-    # Use batches of 10 movements
-    n_movements = 10
-
-    was_dead = False
-    leave_battleground = client.get_sub_image("leave_battleground")
-    cancel_res = client.get_sub_image("cancel_res")
-
-    def update_status():
-        leave_battleground.update_location(client, threshold, grayscale)
-        cancel_res.update_location(client, threshold, grayscale)
-
-    def is_dead():
-        update_status()
-        return cancel_res.found and not leave_battleground.found
 
-    def bg_is_over():
-        update_status()
-        return not cancel_res.found and leave_battleground.found
+    machine = BattlegroundStateMachine(
+        client,
+        n=n,
+        target_name=target_name,
+        interact_with_target_key=interact_with_target_key,
+        mount_key=mount_key,
+        move_forward_key=move_forward_key,
+        turn_left_key=turn_left_key,
+        turn_right_key=turn_right_key,
+        threshold=threshold,
+        grayscale=grayscale,
+        max_wait_time=max_wait_time,
+        tick_rate=tick_rate,
+        cpu_budget=cpu_budget,
+    )
 
     try:
-        for i in range(n):
-            queue_and_enter_av(
-                client,
-                target_name,
-                interact_with_target_key,
-                threshold,
-                grayscale,
-                max_wait_time,
-            )
-            time.sleep(random.uniform(115, 120))
-            move_until_death(
-                client,
-                client.movements.get("move_out_of_cave"),
-                move_forward_key,
-                turn_left_key,
-                turn_right_key,
-                threshold,
-                grayscale,
-            )
-            mount_up(client, mount_key, threshold=0.75)
-
-            # Routine to walk to initial spot
-            move_until_death(
-                client,
-                client.movements.get("move_to_harpies"),
-                move_forward_key,
-                turn_left_key,
-                turn_right_key,
-                threshold,
-                grayscale,
-            )
-
-            while True:
-                # Move randomly
-                if not is_dead():
-                    if not was_dead:
-                        # Mount up if not already mounted, then move randomly
-                        mount_up(client, mount_key, threshold, grayscale)
-                        move_randomly_in_bg(
-                            client,
-                            n_movements,
-                            move_forward_key,
-                            turn_left_key,
-                            turn_right_key,
-                            threshold,
-                            grayscale,
-                        )
-                    else:
-                        # Move 100 units away from the graveyard in a straight line after being resurrected
-                        move_until_death(
-                            client,
-                            [{"units": 100, "rotation": 0.0}],
-                            move_forward_key,
-                            turn_left_key,
-                            turn_right_key,
-                            threshold,
-                            grayscale,
-                        )
-                        was_dead = False
-                else:
-                    clear_keys()
-
-                if bg_is_over():
-                    break
-
-                elif is_dead():
-                    clear_keys()
-                    was_dead = True
-                    time.sleep(5)
-
-            clear_keys()
-            print("Info: AV battle is over. Leaving battleground...")
-            move_mouse_to_bbox(leave_battleground.absolute_bbox)
-            print(f"Complete battleground #{i + 1}. Good work!")
-            time.sleep(random.uniform(10, 15))
-
+        machine.run()
     except BaseException as e:
         print(e)
         return False
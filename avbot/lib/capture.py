@@ -0,0 +1,419 @@
+import itertools
+import threading
+import time
+import weakref
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+from mss import mss
+from mss.base import MSSBase
+from mss.screenshot import ScreenShot
+
+# Capture modes: grab the client window only, or the whole monitor then crop
+WINDOW_CAPTURE = "window"
+MONITOR_CAPTURE = "monitor"
+
+# Unique, increasing identifiers for captured frames
+_frame_ids = itertools.count(1)
+
+
+class BufferPool:
+    """
+    Preallocated arrays recycled between frames of the same shape.
+
+    A buffer taken for a frame belongs to that frame for as long as it is alive,
+    it only goes back to the pool once the frame is garbage collected. Arrays read
+    from a frame must therefore not be kept after dropping the frame itself.
+    """
+
+    def __init__(self, max_free: int = 3):
+        """
+        Args:
+            max_free (int): Spare buffers kept per shape, the rest are freed
+        """
+        self.max_free = max_free
+        self._free: Dict[Tuple[int, ...], List[np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, owner: object, shape: Tuple[int, ...]) -> np.ndarray:
+        """A buffer of the given shape, returned to the pool when owner is collected"""
+        with self._lock:
+            free = self._free.get(shape)
+            buffer = free.pop() if free else np.empty(shape, dtype=np.uint8)
+
+        weakref.finalize(owner, self.give, buffer)
+        return buffer
+
+    def give(self, buffer: np.ndarray):
+        with self._lock:
+            free = self._free.setdefault(buffer.shape, [])
+            if len(free) < self.max_free:
+                free.append(buffer)
+
+
+class Frame:
+    """
+    A captured client frame.
+
+    Wraps the BGRA capture buffer as a NumPy view without copying. Grayscale and
+    BGR versions are converted in a single step on first access, into buffers the
+    frame owns, recycled through a BufferPool when one is provided. PIL images are
+    only built on demand.
+    """
+
+    def __init__(
+        self,
+        bgra: np.ndarray,
+        pool: Optional[BufferPool] = None,
+        timestamp: Optional[datetime] = None,
+        source: Optional[Image.Image] = None,
+        captured_at: Optional[float] = None,
+    ):
+        self.bgra = bgra
+        self.pool = pool
+        self.timestamp = timestamp if timestamp else datetime.now()
+        self.source = source
+        self.frame_id = next(_frame_ids)
+        self.captured_at = captured_at if captured_at else time.monotonic()
+        self._gray: Optional[np.ndarray] = None
+        self._bgr: Optional[np.ndarray] = None
+        self._pyramid: Dict[Tuple[bool, int], np.ndarray] = {}
+        self._signatures: Dict[int, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return (
+            f"Frame #{self.frame_id} | Size: {self.size} | Timestamp: {self.timestamp}"
+        )
+
+    @classmethod
+    def from_screenshot(
+        cls,
+        sct_img: ScreenShot,
+        pool: Optional[BufferPool] = None,
+        captured_at: Optional[float] = None,
+    ) -> "Frame":
+        """Wrap an mss screenshot without copying its pixels"""
+        bgra = np.frombuffer(sct_img.raw, dtype=np.uint8).reshape(
+            sct_img.height, sct_img.width, 4
+        )
+        return cls(bgra, pool, captured_at=captured_at)
+
+    @classmethod
+    def from_pil(cls, image: Image.Image, pool: Optional[BufferPool] = None) -> "Frame":
+        """Build a frame from a PIL image, e.g. a screenshot loaded from disk"""
+        rgb = np.asarray(image.convert("RGB"))
+        return cls(cv2.cvtColor(rgb, cv2.COLOR_RGB2BGRA), pool, source=image)
+
+    @property
+    def age(self) -> float:
+        """Seconds elapsed since the frame was captured"""
+        return time.monotonic() - self.captured_at
+
+    @property
+    def width(self) -> int:
+        return self.bgra.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.bgra.shape[0]
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.width, self.height
+
+    @property
+    def gray(self) -> np.ndarray:
+        """Single channel version of the frame, converted straight from BGRA"""
+        with self._lock:
+            if self._gray is None:
+                dst = self.pool.take(self, self.bgra.shape[:2]) if self.pool else None
+                self._gray = cv2.cvtColor(self.bgra, cv2.COLOR_BGRA2GRAY, dst=dst)
+            return self._gray
+
+    @property
+    def bgr(self) -> np.ndarray:
+        """Three channel version of the frame, as expected by OpenCV"""
+        with self._lock:
+            if self._bgr is None:
+                shape = self.bgra.shape[:2] + (3,)
+                dst = self.pool.take(self, shape) if self.pool else None
+                self._bgr = cv2.cvtColor(self.bgra, cv2.COLOR_BGRA2BGR, dst=dst)
+            return self._bgr
+
+    def downscaled(self, level: int, grayscale: bool = True) -> np.ndarray:
+        """
+        The frame halved `level` times with cv2.pyrDown, cached for every template.
+
+        Args:
+            level (int): Pyramid level, 0 being the full resolution frame
+            grayscale (bool): Whether to downscale the grayscale or BGR frame
+
+        Returns:
+            np.ndarray: The downscaled frame
+        """
+        if level == 0:
+            return self.gray if grayscale else self.bgr
+
+        key = (grayscale, level)
+        image = self._pyramid.get(key)
+        if image is None:
+            image = cv2.pyrDown(self.downscaled(level - 1, grayscale))
+            self._pyramid[key] = image
+        return image
+
+    def signature(self, cell_size: int) -> np.ndarray:
+        """
+        Mean gray level of each cell_size x cell_size cell, cached for every template.
+
+        The cells on the right and bottom edges are cut short when the frame size
+        is not a multiple of cell_size, their mean covers the pixels they hold.
+        """
+        grid = self._signatures.get(cell_size)
+        if grid is None:
+            row_starts = np.arange(0, self.height, cell_size)
+            col_starts = np.arange(0, self.width, cell_size)
+            sums = np.add.reduceat(self.gray, row_starts, axis=0, dtype=np.int64)
+            sums = np.add.reduceat(sums, col_starts, axis=1)
+            counts = np.outer(
+                np.diff(row_starts, append=self.height),
+                np.diff(col_starts, append=self.width),
+            )
+            grid = np.rint(sums / counts).astype(np.int16)
+            self._signatures[cell_size] = grid
+        return grid
+
+    def crop(self, location: Tuple[int, int, int, int]) -> "Frame":
+        """
+        Crop the frame without copying.
+
+        Args:
+            location (Location): left, top, right, bottom of the crop
+
+        Returns:
+            Frame: A frame viewing the same buffer
+        """
+        left, top, right, bottom = location
+        return Frame(
+            self.bgra[top:bottom, left:right],
+            self.pool,
+            timestamp=self.timestamp,
+            captured_at=self.captured_at,
+        )
+
+    def to_pil(self) -> Image.Image:
+        """The frame as an RGB PIL image, built once then kept as its source"""
+        with self._lock:
+            if self.source is None:
+                self.source = Image.fromarray(
+                    cv2.cvtColor(self.bgra, cv2.COLOR_BGRA2RGB)
+                )
+        return self.source
+
+
+class CaptureEngine:
+    """
+    Long-lived screen capture engine.
+
+    mss handles are bound to the thread that created them, so the engine lazily
+    opens one handle per thread and reuses it for every subsequent grab. All
+    handles are closed together when the session ends.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._handles: List[MSSBase] = []
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def __repr__(self):
+        return f"CaptureEngine | Open handles: {len(self._handles)}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def sct(self) -> MSSBase:
+        """The capture handle owned by the calling thread"""
+        if self.closed:
+            raise RuntimeError("Capture engine is closed")
+
+        handle: Optional[MSSBase] = getattr(self._local, "sct", None)
+        if handle is None:
+            handle = mss()
+            self._local.sct = handle
+            with self._lock:
+                self._handles.append(handle)
+
+        return handle
+
+    @property
+    def pool(self) -> BufferPool:
+        """The conversion buffers owned by the calling thread"""
+        pool: Optional[BufferPool] = getattr(self._local, "pool", None)
+        if pool is None:
+            pool = BufferPool()
+            self._local.pool = pool
+        return pool
+
+    @property
+    def monitors(self) -> List[dict]:
+        return self.sct.monitors
+
+    def grab(self, region: dict) -> ScreenShot:
+        """
+        Grab a region of the screen.
+
+        Args:
+            region (dict): mss region with left, top, width and height keys
+
+        Returns:
+            ScreenShot: The raw BGRA screenshot
+        """
+        return self.sct.grab(region)
+
+    def grab_monitor(self, number: int) -> ScreenShot:
+        """Grab a full monitor using its mss number"""
+        return self.grab(self.monitors[number])
+
+    def grab_frame(self, region: dict) -> Frame:
+        """Grab a region of the screen as a Frame"""
+        captured_at = time.monotonic()
+        return Frame.from_screenshot(self.grab(region), self.pool, captured_at)
+
+    def grab_monitor_frame(self, number: int) -> Frame:
+        """Grab a full monitor as a Frame"""
+        captured_at = time.monotonic()
+        return Frame.from_screenshot(self.grab_monitor(number), self.pool, captured_at)
+
+    def release_thread(self):
+        """Close the handle owned by the calling thread, typically before it exits"""
+        handle: Optional[MSSBase] = getattr(self._local, "sct", None)
+        if handle is None:
+            return
+
+        self._local.sct = None
+        self._local.pool = None
+        with self._lock:
+            if handle in self._handles:
+                self._handles.remove(handle)
+        handle.close()
+
+    def close(self):
+        """Close every capture handle opened by the engine"""
+        with self._lock:
+            handles, self._handles = self._handles, []
+            self.closed = True
+
+        for handle in handles:
+            try:
+                handle.close()
+            except Exception as e:
+                print(f"Error closing capture handle: {e}")
+
+
+class CaptureThread:
+    """
+    Background producer capturing frames at a fixed rate into a small ring buffer.
+
+    Consumers read the latest completed frame without blocking, so capturing frame
+    N+1 overlaps with matching frame N on the consumer threads.
+    """
+
+    def __init__(
+        self,
+        grab: Callable[[], Frame],
+        engine: Optional[CaptureEngine] = None,
+        fps: float = 20.0,
+        depth: int = 2,
+    ):
+        self.grab = grab
+        self.engine = engine
+        self.fps = fps
+        self.frames: Deque[Frame] = deque(maxlen=depth)
+        self.captured = 0
+        self.errors = 0
+        self._new_frame = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __repr__(self):
+        return f"CaptureThread | FPS: {self.fps} | Captured: {self.captured}"
+
+    @property
+    def interval(self) -> float:
+        return 1.0 / self.fps
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def latest(self) -> Optional[Frame]:
+        """The most recent completed frame, if any"""
+        with self._new_frame:
+            return self.frames[-1] if self.frames else None
+
+    def wait_for_frame(
+        self, newer_than: float, timeout: Optional[float] = None
+    ) -> Optional[Frame]:
+        """
+        Block until a frame captured after a given time is available.
+
+        Args:
+            newer_than (float): time.monotonic() value the frame must be captured after
+            timeout (Optional[float]): Max wait in seconds, defaults to 3 intervals
+
+        Returns:
+            Optional[Frame]: The frame, or None on timeout
+        """
+        timeout = 3 * self.interval if timeout is None else timeout
+        with self._new_frame:
+            self._new_frame.wait_for(
+                lambda: self.frames and self.frames[-1].captured_at >= newer_than,
+                timeout=timeout,
+            )
+            if self.frames and self.frames[-1].captured_at >= newer_than:
+                return self.frames[-1]
+        return None
+
+    def _run(self):
+        try:
+            while not self._stop_event.is_set():
+                start_time = time.monotonic()
+                try:
+                    frame = self.grab()
+                except Exception as e:
+                    self.errors += 1
+                    print(f"Error capturing frame: {e}")
+                else:
+                    with self._new_frame:
+                        self.frames.append(frame)
+                        self.captured += 1
+                        self._new_frame.notify_all()
+
+                elapsed = time.monotonic() - start_time
+                self._stop_event.wait(max(0.0, self.interval - elapsed))
+        finally:
+            if self.engine is not None and not self.engine.closed:
+                self.engine.release_thread()
@@ -0,0 +1,119 @@
+import threading
+import time
+from typing import Hashable, Optional
+
+from avbot.constants import LOOP_BACKOFF, LOOP_MAX_INTERVAL, LOOP_TICK_RATE
+
+# State of a governor that has not ticked yet
+_NO_STATE = object()
+
+
+class LoopGovernor:
+    """
+    Paces a polling loop and keeps its CPU usage within a budget.
+
+    The loop calls wait at the end of each iteration with the state it observed.
+    While the state is stable, the pause between iterations grows from
+    1 / tick_rate up to max_interval. A new state skips the pause and restarts
+    from the shortest one. With a CPU budget, the pause of a stable iteration is
+    also stretched so that CPU time stays under that share of the wall time.
+
+    CPU time is the time of the thread running the loop, the capture and detector
+    threads have their own pacing. Pauses never exceed max_interval and end early
+    when interrupt is called.
+    """
+
+    def __init__(
+        self,
+        tick_rate: float = LOOP_TICK_RATE,
+        cpu_budget: Optional[float] = None,
+        max_interval: float = LOOP_MAX_INTERVAL,
+        backoff: float = LOOP_BACKOFF,
+    ):
+        """
+        Args:
+            tick_rate (float): Target iterations per second after a state change
+            cpu_budget (Optional[float]): Max share of one core, e.g. 0.25
+            max_interval (float): Longest pause in seconds while the state is stable
+            backoff (float): Factor applied to the pause at each stable iteration
+        """
+        self.min_interval = 1.0 / tick_rate
+        self.cpu_budget = cpu_budget
+        self.max_interval = max(max_interval, self.min_interval)
+        self.backoff = backoff
+        self._wake = threading.Event()
+        self.reset()
+
+    def __repr__(self):
+        return (
+            f"LoopGovernor | Ticks: {self.ticks} | Transitions: {self.transitions}"
+            f" | CPU per tick: {1000 * self.cpu_per_tick:.1f} ms"
+            f" | CPU share: {self.cpu_share:.0%}"
+        )
+
+    def reset(self):
+        """Forget the state and statistics, e.g. before a new battleground"""
+        self.interval = self.min_interval
+        self.state = _NO_STATE
+        self.ticks = 0
+        self.transitions = 0
+        self.cpu_time = 0.0
+        self.busy_time = 0.0
+        self.sleep_time = 0.0
+        self._tick_start = time.monotonic()
+        self._cpu_start = time.thread_time()
+
+    @property
+    def cpu_per_tick(self) -> float:
+        """Average CPU seconds spent per iteration"""
+        return self.cpu_time / self.ticks if self.ticks else 0.0
+
+    @property
+    def cpu_share(self) -> float:
+        """CPU time over wall time, 1.0 being one core busy all the time"""
+        wall_time = self.busy_time + self.sleep_time
+        return self.cpu_time / wall_time if wall_time else 0.0
+
+    def wait(self, state: Hashable) -> float:
+        """
+        End a loop iteration, pausing as long as the pacing requires.
+
+        Args:
+            state (Hashable): What the iteration observed, compared with the last one
+
+        Returns:
+            float: The seconds paused
+        """
+        elapsed = time.monotonic() - self._tick_start
+        cpu_used = time.thread_time() - self._cpu_start
+        self.ticks += 1
+        self.busy_time += elapsed
+        self.cpu_time += cpu_used
+
+        if state != self.state:
+            # React to the new state right away
+            if self.state is not _NO_STATE:
+                self.transitions += 1
+            self.state = state
+            self.interval = self.min_interval
+            delay = 0.0
+        else:
+            delay = max(0.0, self.interval - elapsed)
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+            if self.cpu_budget:
+                delay = max(delay, cpu_used / self.cpu_budget - elapsed)
+            delay = min(delay, self.max_interval)
+
+        if delay > 0:
+            if self._wake.wait(delay):
+                delay = time.monotonic() - self._tick_start - elapsed
+            self._wake.clear()
+        self.sleep_time += delay
+
+        self._tick_start = time.monotonic()
+        self._cpu_start = time.thread_time()
+        return delay
+
+    def interrupt(self):
+        """End the current pause early, e.g. from a detector callback"""
+        self._wake.set()
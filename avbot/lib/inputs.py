@@ -0,0 +1,223 @@
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+import keyboard
+import pyautogui
+
+
+@dataclass
+class InputStats:
+    """Latency of the calls made for one kind of input action"""
+
+    calls: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.calls if self.calls else 0.0
+
+    def add(self, elapsed: float):
+        self.calls += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
+
+class InputBackend(ABC):
+    """
+    Sends keyboard and mouse input to the game.
+
+    Subclasses implement the _key_down, _key_up, _click, _move_to, position and
+    is_pressed primitives.
+    The public methods time every call, so that the latency an action adds to a
+    movement is known, and keep track of the keys held down.
+    """
+
+    def __init__(self):
+        self.stats: Dict[str, InputStats] = {}
+        self.pressed: Set[str] = set()
+
+    def __repr__(self):
+        actions = " | ".join(
+            f"{action}: {stats.calls}x {1000 * stats.mean_time:.2f} ms"
+            f" (max {1000 * stats.max_time:.2f} ms)"
+            for action, stats in self.stats.items()
+        )
+        return f"{type(self).__name__} | {actions or 'No input sent'}"
+
+    def _timed(self, action: str, function, *args):
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            self.stats.setdefault(action, InputStats()).add(time.perf_counter() - start)
+
+    def key_down(self, key: str):
+        self._timed("key_down", self._key_down, key)
+        self.pressed.add(key)
+
+    def key_up(self, key: str):
+        self._timed("key_up", self._key_up, key)
+        self.pressed.discard(key)
+
+    def press(self, key: str, duration: float = 0.0):
+        """Tap a key, holding it down for duration seconds"""
+        self.key_down(key)
+        if duration:
+            time.sleep(duration)
+        self.key_up(key)
+
+    def click(self):
+        self._timed("click", self._click)
+
+    def move_to(self, x: float, y: float, duration: float = 0.0):
+        """Move the cursor to x, y, gliding over duration seconds"""
+        self._timed("move_to", self._move_to, x, y, duration)
+
+    def release_all(self):
+        """Release every key this backend pressed"""
+        for key in list(self.pressed):
+            self.key_up(key)
+
+    @abstractmethod
+    def is_pressed(self, key: str) -> bool:
+        pass
+
+    @abstractmethod
+    def _key_down(self, key: str):
+        pass
+
+    @abstractmethod
+    def _key_up(self, key: str):
+        pass
+
+    @abstractmethod
+    def _click(self):
+        pass
+
+    @abstractmethod
+    def position(self) -> Tuple[int, int]:
+        """The current cursor position"""
+
+    @abstractmethod
+    def _move_to(self, x: float, y: float, duration: float):
+        pass
+
+
+class PyAutoGuiBackend(InputBackend):
+    """
+    Input through pyautogui, without its implicit pause.
+
+    pyautogui sleeps for pyautogui.PAUSE (0.1 s by default) after every call,
+    which would add to the hold times computed for movements. Calls made through
+    this backend skip it, pause restores a fixed delay if one is needed.
+    """
+
+    def __init__(self, pause: float = 0.0):
+        super().__init__()
+        self.pause = pause
+
+    def _wait(self):
+        if self.pause:
+            time.sleep(self.pause)
+
+    def _key_down(self, key: str):
+        pyautogui.keyDown(key, _pause=False)
+        self._wait()
+
+    def _key_up(self, key: str):
+        pyautogui.keyUp(key, _pause=False)
+        self._wait()
+
+    def _click(self):
+        pyautogui.click(_pause=False)
+        self._wait()
+
+    def _move_to(self, x: float, y: float, duration: float):
+        pyautogui.moveTo(x, y, duration=duration, _pause=False)
+        self._wait()
+
+    def position(self) -> Tuple[int, int]:
+        x, y = pyautogui.position()
+        return x, y
+
+    def is_pressed(self, key: str) -> bool:
+        return keyboard.is_pressed(key)
+
+
+class RecordingBackend(InputBackend):
+    """
+    Records input instead of sending it, for tests and dry runs.
+
+    Events are (monotonic time, action, key) tuples, key is None for clicks and
+    cursor moves. The cursor starts at 0, 0 and only moves in `cursor`.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.events: List[Tuple[float, str, Optional[str]]] = []
+        self.cursor: Tuple[float, float] = (0, 0)
+
+    def _key_down(self, key: str):
+        self.events.append((time.monotonic(), "key_down", key))
+
+    def _key_up(self, key: str):
+        self.events.append((time.monotonic(), "key_up", key))
+
+    def _click(self):
+        self.events.append((time.monotonic(), "click", None))
+
+    def _move_to(self, x: float, y: float, duration: float):
+        if duration:
+            time.sleep(duration)
+        self.cursor = (x, y)
+        self.events.append((time.monotonic(), "move_to", None))
+
+    def position(self) -> Tuple[int, int]:
+        return round(self.cursor[0]), round(self.cursor[1])
+
+    def is_pressed(self, key: str) -> bool:
+        return key in self.pressed
+
+    def hold_times(self, key: str) -> List[float]:
+        """Durations between each press of key and its release, in seconds"""
+        durations = []
+        pressed_at = None
+        for timestamp, action, event_key in self.events:
+            if event_key != key:
+                continue
+            if action == "key_down" and pressed_at is None:
+                pressed_at = timestamp
+            elif action == "key_up" and pressed_at is not None:
+                durations.append(timestamp - pressed_at)
+                pressed_at = None
+        return durations
+
+
+_backend: Optional[InputBackend] = None
+
+
+def get_input_backend() -> InputBackend:
+    """The backend movements send their input through, pyautogui by default"""
+    global _backend
+    if _backend is None:
+        _backend = PyAutoGuiBackend()
+    return _backend
+
+
+def set_input_backend(backend: Optional[InputBackend]) -> Optional[InputBackend]:
+    """
+    Replace the input backend.
+
+    Args:
+        backend (Optional[InputBackend]): The new backend, None for the default one
+
+    Returns:
+        Optional[InputBackend]: The previous backend
+    """
+    global _backend
+    previous = _backend
+    _backend = backend
+    return previous
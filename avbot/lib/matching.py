@@ -0,0 +1,300 @@
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from avbot.lib.capture import Frame
+from avbot.lib.utils import Location, pad_location
+from avbot.constants import (
+    GATE_CELL_SIZE,
+    GATE_TOLERANCE,
+    PYRAMID_MIN_TEMPLATE_SIZE,
+    PYRAMID_CANDIDATES,
+    PYRAMID_COARSE_MARGIN,
+)
+
+# Found, location within the frame, best TM_CCOEFF_NORMED score
+MatchResult = Tuple[bool, Optional[Location], float]
+
+
+def locate_template(
+    image: np.ndarray,
+    template: np.ndarray,
+    threshold: float = 0.9,
+    search_region: Optional[Location] = None,
+) -> MatchResult:
+    """
+    Locate a template within an image.
+
+    Args:
+        image (np.ndarray): The image to search, grayscale or BGR
+        template (np.ndarray): The template, in the same color mode as image
+        threshold (float): The matching threshold (0-1)
+        search_region (Optional[Location]): Only search this part of the image
+
+    Returns:
+        MatchResult: Whether the template was found, its location and the best score
+    """
+    # Get template dimensions
+    h, w = template.shape[:2]
+
+    # Restrict the search to a region of the image
+    offset_x, offset_y = 0, 0
+    if search_region is not None:
+        offset_x, offset_y, right, bottom = search_region
+        image = image[offset_y:bottom, offset_x:right]
+
+    if image.shape[0] < h or image.shape[1] < w:
+        return False, None, 0.0
+
+    # Use template matching, cv2 releases the GIL while it runs
+    result = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+
+    # For TM_CCOEFF_NORMED, the max value is our best match
+    _min_val, max_val, _min_loc, max_loc = cv2.minMaxLoc(result)
+    if max_val >= threshold:
+        left, top = max_loc[0] + offset_x, max_loc[1] + offset_y
+        return True, Location(left, top, left + w, top + h), max_val
+
+    return False, None, max_val
+
+
+def build_pyramid(template: np.ndarray, levels: int) -> List[np.ndarray]:
+    """
+    Halve a template up to `levels` times with cv2.pyrDown.
+
+    Levels that would shrink the template below PYRAMID_MIN_TEMPLATE_SIZE pixels
+    are dropped, so the pyramid may be shorter than requested.
+
+    Returns:
+        List[np.ndarray]: The template at each level, the first being full resolution
+    """
+    pyramid = [template]
+    for _ in range(levels):
+        h, w = pyramid[-1].shape[:2]
+        if min(h, w) // 2 < PYRAMID_MIN_TEMPLATE_SIZE:
+            break
+        pyramid.append(cv2.pyrDown(pyramid[-1]))
+
+    return pyramid
+
+
+def locate_template_pyramid(
+    frame: Frame,
+    pyramid: List[np.ndarray],
+    threshold: float = 0.9,
+    grayscale: bool = True,
+    levels: int = 1,
+    candidates: int = PYRAMID_CANDIDATES,
+) -> MatchResult:
+    """
+    Coarse to fine template search.
+
+    The template is first matched at a reduced resolution against the equally
+    downscaled frame. The best candidates are then refined at full resolution in a
+    small region around each of them.
+
+    Args:
+        frame (Frame): The frame to search
+        pyramid (List[np.ndarray]): Template pyramid, see build_pyramid
+        threshold (float): The matching threshold (0-1)
+        grayscale (bool): Whether the pyramid is grayscale
+        levels (int): Pyramid level used for the coarse search
+        candidates (int): Number of coarse candidates refined at full resolution
+
+    Returns:
+        MatchResult: Whether the template was found, its location and the best score
+    """
+    level = min(levels, len(pyramid) - 1)
+    image = frame.downscaled(0, grayscale)
+    if level == 0:
+        return locate_template(image, pyramid[0], threshold)
+
+    coarse_image = frame.downscaled(level, grayscale)
+    coarse_template = pyramid[level]
+    ch, cw = coarse_template.shape[:2]
+    if coarse_image.shape[0] < ch or coarse_image.shape[1] < cw:
+        return False, None, 0.0
+
+    scores = cv2.matchTemplate(coarse_image, coarse_template, cv2.TM_CCOEFF_NORMED)
+    coarse_score = float(scores.max())
+
+    # Downscaling blurs the template, so coarse scores run lower than full ones
+    coarse_threshold = threshold - PYRAMID_COARSE_MARGIN
+    h, w = pyramid[0].shape[:2]
+    scale = 2**level
+    best: Optional[MatchResult] = None
+    for _ in range(candidates):
+        _min_val, max_val, _min_loc, max_loc = cv2.minMaxLoc(scores)
+        if max_val < coarse_threshold:
+            break
+
+        # Refine around the candidate at full resolution
+        left, top = max_loc[0] * scale, max_loc[1] * scale
+        region = pad_location(
+            Location(left, top, left + w, top + h),
+            2 * scale,
+            image.shape[1],
+            image.shape[0],
+        )
+        result = locate_template(image, pyramid[0], threshold, region)
+        if best is None or (result[0], result[2]) > (best[0], best[2]):
+            best = result
+
+        # Suppress the neighbourhood of this candidate before picking the next one
+        x, y = max_loc
+        scores[
+            max(0, y - ch // 2) : y + ch // 2 + 1, max(0, x - cw // 2) : x + cw // 2 + 1
+        ] = -1
+
+    if best is None:
+        # No candidate was worth refining, report the coarse score
+        return False, None, coarse_score
+
+    return best
+
+
+@dataclass
+class MatchCache:
+    """
+    Template match results for the current frame.
+
+    Results are keyed by (frame id, template name, threshold, grayscale) and are
+    dropped as soon as a lookup is made against a newer frame.
+    """
+
+    frame_id: Optional[int] = None
+    results: Dict[Hashable, MatchResult] = field(default_factory=dict)
+    hits: int = 0
+    misses: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def __repr__(self):
+        return f"MatchCache | Hits: {self.hits} | Misses: {self.misses}"
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _sync(self, frame: Frame) -> bool:
+        """Drop the results of older frames, returns False if frame is outdated"""
+        if self.frame_id is None or frame.frame_id > self.frame_id:
+            self.frame_id = frame.frame_id
+            self.results.clear()
+        return frame.frame_id == self.frame_id
+
+    def get(
+        self, frame: Frame, name: str, threshold: float, grayscale: bool
+    ) -> Optional[MatchResult]:
+        """Returns the cached result for the template on this frame, if any"""
+        with self.lock:
+            result = None
+            if self._sync(frame):
+                result = self.results.get((name, threshold, grayscale))
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return result
+
+    def put(
+        self,
+        frame: Frame,
+        name: str,
+        threshold: float,
+        grayscale: bool,
+        result: MatchResult,
+    ):
+        with self.lock:
+            if self._sync(frame):
+                self.results[(name, threshold, grayscale)] = result
+
+    def clear(self):
+        with self.lock:
+            self.frame_id = None
+            self.results.clear()
+
+    def reset_stats(self):
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+
+
+@dataclass
+class SearchStats:
+    """Counts how often a template was found in its hot region"""
+
+    region_hits: int = 0
+    region_misses: int = 0
+    full_searches: int = 0
+    evaluations: int = 0
+    gated_skips: int = 0
+
+    def __repr__(self):
+        return (
+            f"Region hits: {self.region_hits} | Region misses: {self.region_misses}"
+            f" | Full searches: {self.full_searches}"
+            f" | Skipped: {self.gated_skips}/{self.evaluations}"
+        )
+
+    @property
+    def skip_rate(self) -> float:
+        """Share of evaluations answered by the change gate without matching"""
+        return self.gated_skips / self.evaluations if self.evaluations else 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.region_hits + self.region_misses
+        return self.region_hits / total if total else 0.0
+
+
+def region_signature(frame: Frame, region: Location) -> np.ndarray:
+    """The cells of the frame signature covering a region"""
+    left, top, right, bottom = region
+    return frame.signature(GATE_CELL_SIZE)[
+        top // GATE_CELL_SIZE : -(-bottom // GATE_CELL_SIZE),
+        left // GATE_CELL_SIZE : -(-right // GATE_CELL_SIZE),
+    ]
+
+
+@dataclass
+class ChangeGate:
+    """
+    Remembers the region a match result was computed from.
+
+    When the same search runs again and that region looks the same in the new
+    frame, the previous result is reused and template matching is skipped. The
+    scheduler thread and the main thread search the same sub-images, the lock
+    keeps the stored region, signature and result consistent with each other.
+    """
+
+    key: Optional[Hashable] = None
+    region: Optional[Location] = None
+    signature: Optional[np.ndarray] = None
+    result: Optional[MatchResult] = None
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def lookup(self, frame: Frame, key: Hashable) -> Optional[MatchResult]:
+        """Returns the previous result if the region did not change"""
+        with self.lock:
+            if self.result is None or key != self.key:
+                return None
+
+            signature = region_signature(frame, self.region)
+            if signature.shape != self.signature.shape or signature.size == 0:
+                return None
+            if np.abs(signature - self.signature).max() > GATE_TOLERANCE:
+                return None
+
+            return self.result
+
+    def store(self, frame: Frame, key: Hashable, region: Location, result: MatchResult):
+        signature = region_signature(frame, region).copy()
+        with self.lock:
+            self.key = key
+            self.region = region
+            self.signature = signature
+            self.result = result
@@ -1,15 +1,28 @@
 import time
 import copy
+import json
+import itertools
 import threading
 import random
-import pyautogui
-from typing import Optional, List, Dict, Union, Tuple
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, List, Dict, Iterable, Iterator, Union, Tuple, TYPE_CHECKING
 
 import numpy as np
 
-from avbot.lib.screen import WoWclient
 from avbot.lib.utils import key_up_all, clear_keys
+from avbot.lib.inputs import get_input_backend
+from avbot.lib.timeline import (
+    TimelineEvent,
+    KEY_DOWN,
+    KEY_UP,
+    CHECKPOINT,
+    StopEvent,
+    get_timeline_executor,
+)
 from avbot.lib.exceptions import MovementsNotFoundException
+from avbot.lib.scheduler import APPEAR
 from avbot.constants import (
     TURN_360,
     TURN_90_FACTOR,
@@ -20,8 +33,14 @@ from avbot.constants import (
     TURN_180_MOVING_FACTOR,
     TURN_270_MOVING_FACTOR,
     TURN_360_MOVING_FACTOR,
+    DEATH_CHECK_INTERVAL,
+    PROBE_CHECK_INTERVAL,
 )
 
+# Only needed for annotations, so that moving does not import the capture stack
+if TYPE_CHECKING:
+    from avbot.lib.screen import WoWclient
+
 
 y_known_idle = np.array([0.0, TURN_90_FACTOR, TURN_180_FACTOR, TURN_270_FACTOR, 1.0])
 y_known_moving = np.array(
@@ -50,9 +69,7 @@ def rotate(factor: float, turn_left_key: str = "[", turn_right_key: str = "]"):
     factor = abs(factor) % 1 if factor != 1 else factor
     adjustment = np.interp(factor, x_known, y_known_idle)
 
-    pyautogui.keyDown(key)
-    time.sleep(factor * adjustment * TURN_360)
-    pyautogui.keyUp(key)
+    get_input_backend().press(key, factor * adjustment * TURN_360)
 
 
 def move_forward(units: float, move_forward_key="w"):
@@ -64,9 +81,7 @@ def move_forward(units: float, move_forward_key="w"):
         move_forward_key (str): Key to move forward
     """
     clear_keys()
-    pyautogui.keyDown(move_forward_key)
-    time.sleep(units / W_SPEED)
-    pyautogui.keyUp(move_forward_key)
+    get_input_backend().press(move_forward_key, units / W_SPEED)
 
 
 def adjust_units(
@@ -149,8 +164,252 @@ def preprocess_movements(movements: List[Dict[str, float]]) -> List[Dict[str, fl
     return output
 
 
+# Compiled plans: key roles, resolved to key bindings at replay, and event layout
+FORWARD, LEFT, RIGHT = 0, 1, 2
+PLAN_ACTIONS = (CHECKPOINT, KEY_DOWN, KEY_UP)
+PLAN_DTYPE = np.dtype([("time", np.float64), ("action", np.uint8), ("key", np.uint8)])
+
+
+@dataclass(frozen=True)
+class MovementPlan:
+    """
+    Movements compiled into key events at absolute times.
+
+    events is a PLAN_DTYPE structured array, with actions indexing PLAN_ACTIONS and
+    keys one of FORWARD, LEFT or RIGHT. Plans are built once by compile_movements
+    and replayed as they are.
+    """
+
+    events: np.ndarray = field(repr=False)
+    duration: float
+    # Source (units, rotation) pairs, before the mount adjustment
+    movements: Tuple[Tuple[float, float], ...] = field(repr=False)
+    mounted: bool = False
+    path: Optional[Path] = None
+    # Whether the forward key is still held when the plan ends, see compile_movements
+    forward_key_down: bool = False
+
+    def __len__(self):
+        return len(self.movements)
+
+    def with_mount(self, mounted: bool) -> "MovementPlan":
+        """The same movements compiled for the other mount state, if needed"""
+        if mounted == self.mounted:
+            return self
+        if self.path is not None:
+            return load_movement_plan(self.path, mounted)
+        return compile_movements(self.movements, mounted)
+
+    def timeline(
+        self,
+        move_forward_key="w",
+        turn_left_key: str = "[",
+        turn_right_key: str = "]",
+    ) -> Iterator[TimelineEvent]:
+        """The events of the plan with the given key bindings"""
+        keys = (move_forward_key, turn_left_key, turn_right_key)
+        for time_, action, key in zip(
+            self.events["time"].tolist(),
+            self.events["action"].tolist(),
+            self.events["key"].tolist(),
+        ):
+            if action:
+                yield TimelineEvent(time_, PLAN_ACTIONS[action], keys[key])
+            else:
+                yield TimelineEvent(time_, CHECKPOINT)
+
+
+def compile_movements(
+    movements: Union[List[Dict[str, float]], Tuple[Tuple[float, float], ...]],
+    mounted: bool = False,
+    path: Optional[Path] = None,
+    forward_key_down: bool = False,
+    release: bool = True,
+) -> MovementPlan:
+    """
+    Compile movements into a plan, vectorized equivalent of preprocess_movements.
+
+    Straight runs longer than a second are split into segments of at most one
+    second, each segment starts with a checkpoint where a stop event is honored.
+
+    Args:
+        movements (Union[List[Dict[str, float]], Tuple[Tuple[float, float], ...]]):
+            {"units", "rotation"} dicts, or (units, rotation) pairs
+        mounted (bool): if we are mounted, halves the units
+        path (Optional[Path]): the file the movements were loaded from
+        forward_key_down (bool): if the forward key is already held, when the
+            plan continues another one
+        release (bool): release the forward key at the end, otherwise it stays
+            held for the plan that follows
+    """
+    source = tuple(
+        (float(m["units"]), float(m["rotation"])) if isinstance(m, dict) else tuple(m)
+        for m in movements
+    )
+    pairs = np.array(source, dtype=np.float64).reshape(-1, 2)
+    units = pairs[:, 0] / 2 if mounted else pairs[:, 0]
+    rotation = pairs[:, 1]
+
+    # Split straight runs, keeping a leading segment for the rotation
+    rotation_time, forward_time, execution_time = get_movement_times(units, rotation)
+    split = (execution_time > 1) & (rotation_time < forward_time)
+    has_rotation = split & (rotation != 0)
+    units_during_rotation = np.divide(
+        rotation_time * units,
+        execution_time,
+        out=np.zeros_like(units),
+        where=has_rotation,
+    )
+    n_strides = np.where(split, (units - units_during_rotation) / W_SPEED, 0.0)
+    full_strides = np.floor(n_strides).astype(np.int64)
+    remainder = n_strides - full_strides
+    counts = np.where(split, has_rotation + full_strides + (remainder > 0), 1)
+
+    # Segment i comes from movement row[i], stride is its index among the strides
+    row = np.repeat(np.arange(len(units)), counts)
+    position = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    stride = position - has_rotation[row]
+    stride_units = np.where(
+        stride < full_strides[row], W_SPEED, remainder[row] * W_SPEED
+    )
+    segment_units = np.where(
+        ~split[row],
+        units[row],
+        np.where(stride < 0, units_during_rotation[row], stride_units),
+    )
+    segment_rotation = np.where(~split[row] | (stride < 0), rotation[row], 0.0)
+    rotation_time, forward_time, execution_time = get_movement_times(
+        segment_units, segment_rotation
+    )
+
+    # Forward key state around each segment, turns longer than the run release it
+    moving = segment_units != 0
+    turning_longer = rotation_time > forward_time
+    forward_down_after = moving & ~turning_longer
+    forward_down_before = np.concatenate([[forward_key_down], forward_down_after[:-1]])
+    turning = rotation_time > 0
+    turn_key = np.where(segment_rotation < 0, LEFT, RIGHT)
+    start = np.cumsum(execution_time) - execution_time
+    duration = float(execution_time.sum())
+
+    # One column per possible event of a segment, in the order they happen:
+    # checkpoint, forward down or up, turn down, forward up, turn up
+    forward = np.full_like(turn_key, FORWARD)
+    mask = np.stack(
+        [
+            np.ones_like(moving),
+            moving & ~forward_down_before,
+            ~moving & forward_down_before,
+            turning,
+            turning_longer & moving,
+            turning,
+        ],
+        axis=1,
+    )
+    times = np.stack(
+        [
+            start,
+            start,
+            start,
+            start,
+            start + forward_time,
+            start + np.where(turning_longer, execution_time, rotation_time),
+        ],
+        axis=1,
+    )
+    actions = np.broadcast_to(np.array([0, 1, 2, 1, 2, 2]), mask.shape)
+    keys = np.stack([forward, forward, forward, turn_key, forward, turn_key], axis=1)
+
+    events = np.empty(int(mask.sum()), PLAN_DTYPE)
+    events["time"] = times[mask]
+    events["action"] = actions[mask]
+    events["key"] = keys[mask]
+    if forward_down_after.size:
+        forward_key_down = bool(forward_down_after[-1])
+    if forward_key_down and release:
+        last_release = np.array([(duration, 2, FORWARD)], PLAN_DTYPE)
+        events = np.concatenate([events, last_release])
+        forward_key_down = False
+
+    return MovementPlan(
+        events=events,
+        duration=duration,
+        movements=source,
+        mounted=mounted,
+        path=path,
+        forward_key_down=forward_key_down,
+    )
+
+
+def get_movement_times(
+    units: np.ndarray, rotation: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Rotation, forward and execution times, as in add_extra_stats_to_movements"""
+    rotation_factor = np.where(rotation != 1, np.abs(rotation) % 1, rotation)
+    adjustment = np.interp(rotation_factor, x_known, y_known_moving)
+    rotation_time = rotation_factor * adjustment * TURN_360
+    forward_time = units / W_SPEED
+    return rotation_time, forward_time, np.maximum(rotation_time, forward_time)
+
+
+def load_movement_plan(path: Path, mounted: bool = False) -> MovementPlan:
+    """
+    Compile a movements json file, cached until the file changes.
+
+    Args:
+        path (Path): json file holding a list of {"units", "rotation"} dicts
+        mounted (bool): if we are mounted
+    """
+    path = Path(path)
+    return _load_movement_plan(path, path.stat().st_mtime_ns, mounted)
+
+
+@lru_cache(maxsize=None)
+def _load_movement_plan(path: Path, mtime_ns: int, mounted: bool) -> MovementPlan:
+    with open(path, "r") as f:
+        movements = json.load(f)
+    return compile_movements(movements, mounted, path)
+
+
+def stream_movement_timeline(
+    movements: Iterable[Dict[str, float]],
+    move_forward_key="w",
+    turn_left_key: str = "[",
+    turn_right_key: str = "]",
+    mounted: bool = False,
+) -> Iterator[TimelineEvent]:
+    """
+    Compile movements one at a time, as the timeline is consumed.
+
+    The executor pulls the next movement right after sending the last event of
+    the current one, so it is compiled while the current one runs. The forward
+    key stays held from one movement to the next and is released at the end.
+
+    Args:
+        movements (Iterable[Dict[str, float]]): movements, possibly endless
+        move_forward_key (str): Key to move forward
+        turn_left_key (str): Key to turn left
+        turn_right_key (str): Key to turn right
+        mounted (bool): if we are mounted
+    """
+    start = 0.0
+    forward_key_down = False
+    for movement in movements:
+        plan = compile_movements(
+            [movement], mounted, forward_key_down=forward_key_down, release=False
+        )
+        for event in plan.timeline(move_forward_key, turn_left_key, turn_right_key):
+            yield event._replace(time=start + event.time)
+
+        start += plan.duration
+        forward_key_down = plan.forward_key_down
+
+    if forward_key_down:
+        yield TimelineEvent(start, KEY_UP, move_forward_key)
+
+
 def moves(
-    movements: Union[List[Dict[str, float]], str],
+    movements: Union[Iterable[Dict[str, float]], MovementPlan],
     move_forward_key="w",
     turn_left_key: str = "[",
     turn_right_key: str = "]",
@@ -161,7 +420,10 @@ def moves(
     Move forward while rotating simultaneously.
 
     Args:
-        movements (Union[List[Dict[str, float]], str]): the list of movements to perform
+        movements (Union[Iterable[Dict[str, float]], MovementPlan]): the movements
+            to perform. Compiled plans are replayed without any preprocessing,
+            lists are compiled up front and other iterables, such as generators,
+            are streamed
         move_forward_key (str): Key to move forward
         turn_left_key (str): Key to turn left
         turn_right_key (str): Key to turn right
@@ -169,53 +431,32 @@ def moves(
         mounted (bool): if we are mounted
     """
     clear_keys()
-    move_forward_key_down = False
-    processed_movements = preprocess_movements(adjust_units(movements, mounted))
-    for movement in processed_movements:
-        if stop_event and stop_event.is_set():
-            print("Movement interrupted by stop event")
-            clear_keys()
-            return False
-
-        turn_key = turn_left_key if movement["rotation"] < 0 else turn_right_key
-
-        if not move_forward_key_down and movement["units"]:
-            pyautogui.keyDown(move_forward_key)
-            move_forward_key_down = True
-
-        elif move_forward_key_down and not movement["units"]:
-            pyautogui.keyUp(move_forward_key)
-
-        if movement["rotation_time"] > movement["forward_time"]:
-            # Start turn
-            pyautogui.keyDown(turn_key)
-            time.sleep(movement["forward_time"])
-            # Stop moving forward while turning
-            pyautogui.keyUp(move_forward_key)
-            move_forward_key_down = False
-            # Finish turn
-            time.sleep(movement["execution_time"] - movement["forward_time"])
-            pyautogui.keyUp(turn_key)
-
-        elif movement["rotation_time"]:
-            # Turn
-            pyautogui.keyDown(turn_key)
-            time.sleep(movement["rotation_time"])
-            pyautogui.keyUp(turn_key)
-            # Keep moving
-            time.sleep(movement["execution_time"] - movement["rotation_time"])
+    if isinstance(movements, MovementPlan):
+        plan = movements.with_mount(mounted)
+        timeline = plan.timeline(move_forward_key, turn_left_key, turn_right_key)
+    elif isinstance(movements, (list, tuple)):
+        plan = compile_movements(movements, mounted)
+        timeline = plan.timeline(move_forward_key, turn_left_key, turn_right_key)
+    else:
+        timeline = stream_movement_timeline(
+            movements, move_forward_key, turn_left_key, turn_right_key, mounted
+        )
 
-        else:
-            # Keep moving
-            time.sleep(movement["execution_time"])
+    executor = get_timeline_executor()
+    completed = executor.run(timeline, stop_event)
+    if not completed:
+        print("Movement interrupted by stop event")
+        if isinstance(stop_event, StopEvent) and stop_event.set_at is not None:
+            latency = executor.stats.last_stop_latency
+            print(f"Info: Keys released {1000 * latency:.1f} ms after the stop")
 
     clear_keys()
-    return True
+    return completed
 
 
 def move_until_death(
-    client: WoWclient,
-    movements: Union[List[Dict[str, float]], str],
+    client: "WoWclient",
+    movements: Union[Iterable[Dict[str, float]], MovementPlan],
     move_forward_key="w",
     turn_left_key: str = "[",
     turn_right_key: str = "]",
@@ -229,7 +470,8 @@ def move_until_death(
 
     Args:
         client (WoWclient): Wow client
-        movements (Union[List[Dict[str, float]], str]): the list of movements to perform
+        movements (Union[Iterable[Dict[str, float]], MovementPlan]): movements to
+            perform, see moves
         move_forward_key (str): Key to move forward
         turn_left_key (str): Key to turn left
         turn_right_key (str): Key to turn right
@@ -238,56 +480,78 @@ def move_until_death(
         update_image (bool): update client image
         early_check (bool): check if dead or bg over off the bat
     """
-    # Load sub-images
     clear_keys()
-    resurrection_sub_image = client.get_sub_image("resurrection")
-    leave_battleground_sub_image = client.get_sub_image("leave_battleground")
-
-    def update_stopping_conditions():
-        resurrection_sub_image.update_location(
-            client, threshold, grayscale, update_image
-        )
-        leave_battleground_sub_image.update_location(
-            client, threshold, grayscale, update_image
-        )
 
-    def should_stop():
-        update_stopping_conditions()
-        return resurrection_sub_image.found or leave_battleground_sub_image.found
+    stopping_conditions = ["resurrection", "leave_battleground"]
+    scheduler = client.get_scheduler()
 
-    if early_check and should_stop():
-        return False
-
-    # Flag to signal when to stop movement
-    stop_event = threading.Event()
-
-    # Thread function to check for resurrection image
-    def check_for_death():
-        while not stop_event.is_set():
-            if should_stop():
-                stop_event.set()
-                break
-            time.sleep(0.25)
+    if early_check:
+        # Both detectors read the same frame, probes first when calibrated
+        frame = None if update_image else client.get_frame()
+        detected = scheduler.check(stopping_conditions, threshold, grayscale, frame)
+        if any(detected.values()):
+            return False
 
-    # Start the death check thread
-    death_check_thread = threading.Thread(target=check_for_death)
-    death_check_thread.daemon = True  # Make thread exit when main thread exits
-    death_check_thread.start()
+    # Flag to signal when to stop movement, timed to measure the stop latency
+    stop_event = StopEvent()
 
-    # Start movement using existing move() function with stop_event
-    movement_completed = moves(
-        movements, move_forward_key, turn_left_key, turn_right_key, stop_event
+    # Pixel probes are cheap enough to poll much more often than templates
+    check_interval = (
+        PROBE_CHECK_INTERVAL
+        if all(name in client.probes for name in stopping_conditions)
+        else DEATH_CHECK_INTERVAL
     )
 
-    # Movement is complete or was interrupted, stop the death check
-    stop_event.set()
-    death_check_thread.join(timeout=1.0)
+    # The scheduler sets the flag as soon as either condition shows up
+    subscriptions = [
+        scheduler.subscribe(
+            name,
+            APPEAR,
+            interval=check_interval,
+            priority=1,
+            threshold=threshold,
+            grayscale=grayscale,
+            flag=stop_event,
+        )
+        for name in stopping_conditions
+    ]
+    scheduler.start()
+
+    try:
+        # Start movement using existing move() function with stop_event
+        movement_completed = moves(
+            movements, move_forward_key, turn_left_key, turn_right_key, stop_event
+        )
+    finally:
+        # Movement is complete or was interrupted, stop the death check
+        for subscription in subscriptions:
+            scheduler.unsubscribe(subscription)
 
     # Return True if the movements were executed
     clear_keys()
     return movement_completed
 
 
+def stream_random_movements(
+    n: Optional[int] = None,
+    units_uniform_params: Optional[Tuple[float, float]] = None,
+    rotation_gaussian_params: Optional[Tuple[float, float]] = None,
+) -> Iterator[Dict[str, float]]:
+    """
+    Lazily generates random movements.
+
+    Args:
+        n (Optional[int]): the number of movements to be performed, None for no end
+        units_uniform_params (tuple): uniform distribution parameters for units
+        rotation_gaussian_params (tuple): gaussian distribution parameters for rotation
+    """
+    a, b = units_uniform_params if units_uniform_params else (5, 40)
+    mu, sigma = rotation_gaussian_params if rotation_gaussian_params else (0.0, 0.2)
+    count = itertools.count() if n is None else range(n)
+    for _ in count:
+        yield {"units": random.uniform(a, b), "rotation": random.gauss(mu, sigma)}
+
+
 def generate_random_movements(
     n: int,
     units_uniform_params: Optional[Tuple[float, float]] = None,
@@ -301,17 +565,14 @@ def generate_random_movements(
         units_uniform_params (tuple): uniform distribution parameters for units
         rotation_gaussian_params (tuple): gaussian distribution parameters for rotation
     """
-    a, b = units_uniform_params if units_uniform_params else 5, 40
-    mu, sigma = rotation_gaussian_params if rotation_gaussian_params else 0.0, 0.2
-    return [
-        {"units": random.uniform(a, b), "rotation": random.gauss(mu, sigma)}
-        for _ in range(n)
-    ]
+    return list(
+        stream_random_movements(n, units_uniform_params, rotation_gaussian_params)
+    )
 
 
 def move_randomly_in_bg(
-    client: WoWclient,
-    n_movements: int = 15,
+    client: "WoWclient",
+    n_movements: Optional[int] = 15,
     move_forward_key="w",
     turn_left_key: str = "[",
     turn_right_key: str = "]",
@@ -324,9 +585,13 @@ def move_randomly_in_bg(
     """
     Move but stop when dead.
 
+    The movements are streamed, so the character keeps moving from one to the
+    next without releasing the forward key.
+
     Args:
         client (WoWclient): Wow client
-        n_movements (int): the number of movements to be performed
+        n_movements (Optional[int]): the number of movements to be performed, None
+            to roam until dead or the battleground ends
         move_forward_key (str): Key to move forward
         turn_left_key (str): Key to turn left
         turn_right_key (str): Key to turn right
@@ -336,7 +601,7 @@ def move_randomly_in_bg(
         units_uniform_params (tuple): uniform distribution parameters for units
         rotation_gaussian_params (tuple): gaussian distribution parameters for rotation
     """
-    movements = generate_random_movements(
+    movements = stream_random_movements(
         n_movements, units_uniform_params, rotation_gaussian_params
     )
     return move_until_death(
@@ -352,7 +617,7 @@ def move_randomly_in_bg(
 
 
 def mount_up(
-    client: WoWclient,
+    client: "WoWclient",
     mount_key: str = "t",
     threshold=0.9,
     grayscale=True,
@@ -373,10 +638,10 @@ def mount_up(
 
     if not mount_subimage.found:
         key_up_all([mount_key])
-        pyautogui.keyDown(mount_key)
-        time.sleep(random.uniform(0.1, 0.2))
-        pyautogui.keyUp(mount_key)
+        get_input_backend().press(mount_key, random.uniform(0.1, 0.2))
         time.sleep(random.uniform(3.0, 3.2))
-        mount_subimage.update_location(client, threshold, grayscale, update_image)
+        mount_subimage.update_location(
+            client, threshold, grayscale, update_image, max_age=0
+        )
 
     return mount_subimage.found
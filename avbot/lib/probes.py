@@ -0,0 +1,164 @@
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from avbot.lib.capture import Frame
+from avbot.lib.utils import Location
+from avbot.constants import PROBE_GRID, PROBE_TOLERANCE
+
+
+@dataclass
+class ProbeStats:
+    """Counts how often a probe could decide on its own"""
+
+    present: int = 0
+    absent: int = 0
+    escalations: int = 0
+
+    def __repr__(self):
+        return (
+            f"Present: {self.present} | Absent: {self.absent}"
+            f" | Escalations: {self.escalations}"
+        )
+
+
+@dataclass
+class PixelProbe:
+    """
+    Detects a fixed UI element from a few pixels at known client coordinates.
+
+    Every point is compared with its expected BGR color. The element is present
+    when all points match, absent when none do, and the probe is ambiguous
+    otherwise, in which case the caller escalates to the template named by
+    escalate_to.
+    """
+
+    name: str = ""
+    points: List[Tuple[int, int]] = field(default_factory=list)
+    colors: List[Tuple[int, int, int]] = field(default_factory=list)
+    tolerance: int = PROBE_TOLERANCE
+    client_size: Optional[Tuple[int, int]] = None
+    escalate_to: Optional[str] = None
+    stats: ProbeStats = field(default_factory=ProbeStats)
+
+    def __repr__(self):
+        return f"PixelProbe Name: {self.name}\nPoints: {len(self.points)}"
+
+    def __eq__(self, other):
+        return self.name == other.name
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.name)
+
+    @classmethod
+    def calibrate(
+        cls,
+        name: str,
+        frame: Frame,
+        location: Location,
+        grid: int = PROBE_GRID,
+        tolerance: int = PROBE_TOLERANCE,
+        escalate_to: Optional[str] = None,
+    ) -> "PixelProbe":
+        """
+        Build a probe from a reference frame showing the element.
+
+        Args:
+            name (str): The probe name
+            frame (Frame): A frame in which the element is visible
+            location (Location): Where the element is in the frame
+            grid (int): Points are sampled on a grid x grid lattice inside location
+            tolerance (int): Max per-channel difference for a point to match
+            escalate_to (Optional[str]): Sub-image to match when ambiguous
+
+        Returns:
+            PixelProbe: The calibrated probe
+        """
+        left, top, right, bottom = location
+        xs = np.linspace(left, right - 1, grid + 2, dtype=int)[1:-1]
+        ys = np.linspace(top, bottom - 1, grid + 2, dtype=int)[1:-1]
+        points = [(int(x), int(y)) for y in ys for x in xs]
+        colors = [tuple(int(c) for c in frame.bgra[y, x, :3]) for x, y in points]
+
+        return cls(
+            name=name,
+            points=points,
+            colors=colors,
+            tolerance=tolerance,
+            client_size=frame.size,
+            escalate_to=escalate_to if escalate_to else name,
+        )
+
+    def evaluate(self, frame: Frame) -> Optional[bool]:
+        """
+        Sample the probe points in a frame.
+
+        Returns:
+            Optional[bool]: True if present, False if absent, None if ambiguous
+        """
+        if self.client_size and tuple(self.client_size) != frame.size:
+            self.stats.escalations += 1
+            return None
+
+        xs, ys = zip(*self.points)
+        samples = frame.bgra[list(ys), list(xs), :3].astype(np.int16)
+        differences = np.abs(samples - np.array(self.colors, dtype=np.int16))
+        matches = int(np.count_nonzero(differences.max(axis=1) <= self.tolerance))
+
+        if matches == len(self.points):
+            self.stats.present += 1
+            return True
+        if matches == 0:
+            self.stats.absent += 1
+            return False
+
+        self.stats.escalations += 1
+        return None
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "points": [list(point) for point in self.points],
+            "colors": [list(color) for color in self.colors],
+            "tolerance": self.tolerance,
+            "client_size": list(self.client_size) if self.client_size else None,
+            "escalate_to": self.escalate_to,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PixelProbe":
+        return cls(
+            name=data["name"],
+            points=[tuple(point) for point in data["points"]],
+            colors=[tuple(color) for color in data["colors"]],
+            tolerance=data.get("tolerance", PROBE_TOLERANCE),
+            client_size=tuple(data["client_size"]) if data.get("client_size") else None,
+            escalate_to=data.get("escalate_to") or data["name"],
+        )
+
+
+def save_probes(probes: Dict[str, PixelProbe], path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump([probe.to_dict() for probe in probes.values()], f, indent=2)
+
+
+def load_probes(path: Path) -> Dict[str, PixelProbe]:
+    if not path.exists():
+        return {}
+
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except json.JSONDecodeError:
+        print(f"Error: Could not parse JSON in {path}")
+        return {}
+
+    probes = [PixelProbe.from_dict(probe) for probe in data]
+    return {probe.name: probe for probe in probes}
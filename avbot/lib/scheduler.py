@@ -0,0 +1,394 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+from avbot.constants import DETECTOR_INTERVAL, FRAME_MAX_AGE
+
+# Only needed for annotations, so that moving does not import the capture stack
+if TYPE_CHECKING:
+    from avbot.lib.capture import Frame
+    from avbot.lib.screen import WoWclient
+
+# Events a subscription waits for: the element becomes visible, or hidden
+APPEAR = "appear"
+DISAPPEAR = "disappear"
+
+
+@dataclass(eq=False)
+class Subscription:
+    """
+    Interest in a UI element appearing or disappearing.
+
+    When the element is seen in the subscribed state, `flag` is set and `callback`
+    is called with its name. This happens on the first evaluation if the element
+    is already in that state, then each time it goes back to it.
+    """
+
+    name: str
+    event: str = APPEAR
+    interval: float = DETECTOR_INTERVAL
+    priority: int = 0
+    threshold: float = 0.9
+    grayscale: bool = True
+    callback: Optional[Callable[[str], None]] = None
+    flag: threading.Event = field(default_factory=threading.Event)
+    # Whether the element was last seen in the subscribed state
+    active: bool = False
+
+    def matches(self, visible: bool) -> bool:
+        return visible if self.event == APPEAR else not visible
+
+
+@dataclass(eq=False)
+class Detector:
+    """
+    A UI element polled on behalf of its subscriptions.
+
+    It is evaluated as often as its most demanding subscription asks for, with
+    the highest of their priorities.
+    """
+
+    name: str
+    threshold: float = 0.9
+    grayscale: bool = True
+    subscriptions: List[Subscription] = field(default_factory=list)
+    visible: Optional[bool] = None
+    checked_at: Optional[float] = None
+    next_check: float = 0.0
+    evaluations: int = 0
+
+    # Subscriptions may be removed from another thread while a tick runs, hence
+    # the defaults
+    @property
+    def interval(self) -> float:
+        return min(
+            (subscription.interval for subscription in self.subscriptions),
+            default=DETECTOR_INTERVAL,
+        )
+
+    @property
+    def priority(self) -> int:
+        return max(
+            (subscription.priority for subscription in self.subscriptions), default=0
+        )
+
+
+class DetectorScheduler:
+    """
+    Runs every subscribed detector from a single capture per tick.
+
+    Each tick evaluates the detectors that are due on one shared snapshot, one
+    priority level at a time from the highest, and fires the subscriptions whose
+    state was reached. When a level fires, the lower levels are left due for the
+    next tick. The scheduler either runs on its own thread (start), which stops
+    once the last subscription is removed, or is driven by the caller (tick,
+    check, wait_for).
+    """
+
+    def __init__(self, client: "WoWclient", max_age: float = FRAME_MAX_AGE):
+        self.client = client
+        self.max_age = max_age
+        self.ticks = 0
+        self._detectors: Dict[Tuple[str, float, bool], Detector] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __repr__(self):
+        return f"DetectorScheduler | Detectors: {len(self._detectors)} | Ticks: {self.ticks}"
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def subscribe(
+        self,
+        name: str,
+        event: str = APPEAR,
+        interval: float = DETECTOR_INTERVAL,
+        priority: int = 0,
+        threshold: float = 0.9,
+        grayscale: bool = True,
+        callback: Optional[Callable[[str], None]] = None,
+        flag: Optional[threading.Event] = None,
+    ) -> Subscription:
+        """
+        Subscribe to an element appearing or disappearing.
+
+        Args:
+            name (str): Sub-image or probe name
+            event (str): APPEAR or DISAPPEAR
+            interval (float): Max seconds between two evaluations of the element
+            priority (int): Detectors with a higher priority are evaluated and
+                fire first, lower ones wait for the next tick when they do
+            threshold (float): The matching threshold for image recognition
+            grayscale (bool): Whether to use grayscale for image recognition
+            callback (Optional[Callable[[str], None]]): Called from the thread
+                running the scheduler when the event fires
+            flag (Optional[threading.Event]): Event to set when the event fires,
+                a new one by default
+
+        Returns:
+            Subscription: Pass it to unsubscribe when done
+        """
+        subscription = Subscription(
+            name=name,
+            event=event,
+            interval=interval,
+            priority=priority,
+            threshold=threshold,
+            grayscale=grayscale,
+            callback=callback,
+            flag=flag if flag is not None else threading.Event(),
+        )
+
+        with self._lock:
+            key = (name, threshold, grayscale)
+            detector = self._detectors.get(key)
+            if detector is None:
+                detector = Detector(name=name, threshold=threshold, grayscale=grayscale)
+                self._detectors[key] = detector
+            detector.subscriptions.append(subscription)
+            # Evaluate the new subscription on the next tick
+            detector.next_check = 0.0
+
+        self._wake.set()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Remove a subscription, stopping the scheduler thread after the last one"""
+        with self._lock:
+            key = (subscription.name, subscription.threshold, subscription.grayscale)
+            detector = self._detectors.get(key)
+            if detector is None or subscription not in detector.subscriptions:
+                return
+            detector.subscriptions.remove(subscription)
+            if not detector.subscriptions:
+                del self._detectors[key]
+            idle = not self._detectors
+
+        if idle and self.running:
+            self.stop()
+
+    def is_visible(self, name: str) -> Optional[bool]:
+        """The last state of a subscribed element, None if not evaluated yet"""
+        with self._lock:
+            for detector in self._detectors.values():
+                if detector.name == name and detector.visible is not None:
+                    return detector.visible
+        return None
+
+    def next_wakeup(self) -> Optional[float]:
+        """Seconds until a detector is due, None without subscriptions"""
+        with self._lock:
+            if not self._detectors:
+                return None
+            next_check = min(d.next_check for d in self._detectors.values())
+        return max(0.0, next_check - time.monotonic())
+
+    def tick(self) -> int:
+        """
+        Evaluate the detectors that are due on a single snapshot.
+
+        Levels below a priority that fired are skipped and stay due.
+
+        Returns:
+            int: The number of detectors evaluated
+        """
+        now = time.monotonic()
+        with self._lock:
+            due = [d for d in self._detectors.values() if d.next_check <= now]
+
+        if not due:
+            return 0
+
+        self.evaluate(due, self.client.snapshot(self.max_age), short_circuit=True)
+        evaluated = [d for d in due if d.checked_at is not None and d.checked_at >= now]
+        with self._lock:
+            for detector in evaluated:
+                # Unsubscribed by a waiter while the tick ran
+                if not detector.subscriptions:
+                    continue
+                detector.next_check = now + detector.interval
+        return len(evaluated)
+
+    def check(
+        self,
+        names: List[str],
+        threshold: float = 0.9,
+        grayscale: bool = True,
+        frame: Optional["Frame"] = None,
+    ) -> Dict[str, bool]:
+        """
+        Evaluate elements right away, firing the subscriptions they satisfy.
+
+        Args:
+            names (List[str]): Names of the elements to check
+            threshold (float): The matching threshold for image recognition
+            grayscale (bool): Whether to use grayscale for image recognition
+            frame (Optional[Frame]): The frame to check, defaults to a snapshot
+
+        Returns:
+            Dict[str, bool]: name -> visible
+        """
+        frame = frame if frame is not None else self.client.snapshot(self.max_age)
+        with self._lock:
+            detectors = [
+                self._detectors.get((name, threshold, grayscale))
+                or Detector(name=name, threshold=threshold, grayscale=grayscale)
+                for name in names
+            ]
+
+        return self.evaluate(detectors, frame)
+
+    def evaluate(
+        self, detectors: List[Detector], frame: "Frame", short_circuit: bool = False
+    ) -> Dict[str, bool]:
+        """
+        Run detectors on a frame, one priority level at a time from the highest.
+
+        Within a level, detectors are grouped by matching parameters. The
+        subscriptions of a level fire before the next level is evaluated.
+
+        Args:
+            detectors (List[Detector]): The detectors to run
+            frame (Frame): The frame to run them on
+            short_circuit (bool): Skip the lower levels once a level fired
+
+        Returns:
+            Dict[str, bool]: name -> visible, for the detectors that ran
+        """
+        levels: Dict[int, Dict[Tuple[float, bool], List[Detector]]] = {}
+        for detector in detectors:
+            priority = detector.priority
+            levels.setdefault(priority, {}).setdefault(
+                (detector.threshold, detector.grayscale), []
+            ).append(detector)
+
+        self.ticks += 1
+        results = {}
+        for priority in sorted(levels, reverse=True):
+            fired = []
+            for (threshold, grayscale), group in levels[priority].items():
+                detected = self.client.detect(
+                    [d.name for d in group], threshold, grayscale, frame
+                )
+                with self._lock:
+                    for detector in group:
+                        fired.extend(self._update(detector, detected[detector.name]))
+                results.update(detected)
+
+            self._fire(fired)
+            if fired and short_circuit:
+                break
+
+        return results
+
+    def _fire(self, subscriptions: List[Subscription]):
+        for subscription in subscriptions:
+            subscription.flag.set()
+            if subscription.callback is not None:
+                try:
+                    subscription.callback(subscription.name)
+                except Exception as e:
+                    print(f"Error in {subscription.name} callback: {e}")
+
+    def _update(self, detector: Detector, visible: bool) -> List[Subscription]:
+        """Record a detector state, returns the subscriptions to fire"""
+        detector.visible = visible
+        detector.checked_at = time.monotonic()
+        detector.evaluations += 1
+
+        fired = []
+        for subscription in detector.subscriptions:
+            matches = subscription.matches(visible)
+            if matches and not subscription.active:
+                fired.append(subscription)
+            subscription.active = matches
+        return fired
+
+    def wait_for(
+        self,
+        name: str,
+        event: str = APPEAR,
+        timeout: Optional[float] = None,
+        **options,
+    ) -> bool:
+        """
+        Block until an element appears or disappears.
+
+        The scheduler thread does the polling when it runs, otherwise the calling
+        thread ticks the scheduler itself.
+
+        Args:
+            name (str): Sub-image or probe name
+            event (str): APPEAR or DISAPPEAR
+            timeout (Optional[float]): Max wait in seconds, None to wait forever
+            **options: Subscription options, see subscribe
+
+        Returns:
+            bool: True if the event fired, False on timeout
+        """
+        subscription = self.subscribe(name, event, **options)
+        try:
+            if self.running:
+                return subscription.flag.wait(timeout)
+
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not subscription.flag.is_set():
+                self.tick()
+                if subscription.flag.is_set():
+                    break
+
+                wait = self.next_wakeup()
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    wait = remaining if wait is None else min(wait, remaining)
+                subscription.flag.wait(wait)
+            return True
+        finally:
+            self.unsubscribe(subscription)
+
+    def start(self):
+        """Poll the detectors on a background thread"""
+        if self.running:
+            return
+
+        # Each thread gets its own event, a stopping thread is never revived
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(self._stop_event,),
+            name="avbot-detectors",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        self._stop_event.set()
+        self._wake.set()
+        thread, self._thread = self._thread, None
+        # A callback may unsubscribe from the scheduler thread itself
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=timeout)
+
+    def _run(self, stop_event: threading.Event):
+        try:
+            while not stop_event.is_set():
+                # Cleared first, so that a subscription made during the tick
+                # wakes the next wait up
+                self._wake.clear()
+                try:
+                    self.tick()
+                except Exception as e:
+                    print(f"Error running detectors: {e}")
+
+                self._wake.wait(self.next_wakeup())
+        finally:
+            engine = self.client.capture_engine
+            if engine is not None and not engine.closed:
+                engine.release_thread()
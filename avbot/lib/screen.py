@@ -1,16 +1,14 @@
 import time
+import threading
 import pyautogui
-import cv2
 import numpy as np
-import psutil
 import json
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
-from typing import Optional, Tuple, List, Union
+from typing import Optional, Tuple, List, Union, Dict, Iterable
 from PIL import Image
 from screeninfo import get_monitors, Monitor
-from mss import mss
 from datetime import datetime
-import pygetwindow as gw
 from collections import namedtuple
 from pathlib import Path
 
@@ -20,66 +18,60 @@ from avbot.lib.utils import (
     get_monitor_bbox,
     get_bbox_center,
     get_mss_monitor_bbox,
+    get_mss_region,
     is_subbox,
     get_relative_location,
     get_absolute_location,
+    pad_location,
     Location,
     move_mouse,
     BBox,
 )
+from avbot.lib.capture import (
+    CaptureEngine,
+    CaptureThread,
+    Frame,
+    WINDOW_CAPTURE,
+    MONITOR_CAPTURE,
+)
+from avbot.lib.window import WoWcoordinates, focus_window
+from avbot.lib.scheduler import DetectorScheduler
+from avbot.lib.probes import PixelProbe, load_probes, save_probes
+from avbot.lib.movements import MovementPlan, load_movement_plan
+from avbot.lib.templates import (
+    BundledTemplate,
+    get_template_cache_dir,
+    get_template_scale,
+    get_template_sources,
+    load_scaled_template,
+    load_template_bundle,
+    preprocess_template,
+)
+from avbot.lib.matching import (
+    ChangeGate,
+    MatchCache,
+    MatchResult,
+    SearchStats,
+    build_pyramid,
+    locate_template,
+    locate_template_pyramid,
+)
+from avbot.constants import (
+    CAPTURE_FPS,
+    FRAME_MAX_AGE,
+    HOT_REGION_PADDING,
+    CALIBRATION_PATH,
+    MATCH_WORKERS,
+    PYRAMID_LEVELS,
+    PROBES_PATH,
+    WINDOW_CHECK_INTERVAL,
+)
 from avbot.lib.exceptions import (
-    WoWnotFoundException,
     MonitorNotFoundException,
     ImageNotFoundException,
 )
 
 
-@dataclass
-class WoWcoordinates:
-    """Represents the coordinates of a WoW client"""
-
-    process_name: str = "WowClassic.exe"
-    process_title: str = "World of Warcraft"
-    bbox: Optional[namedtuple] = None
-    location: Optional[namedtuple] = None
-    open: Optional[bool] = False
-
-    def __repr__(self):
-        return f"Process Name: {self.process_name}\nLocation: {self.location}"
-
-    def __eq__(self, other):
-        return (
-            self.process_name == other.process_name
-            and self.process_title == other.process_title
-        )
-
-    def __ne__(self, other):
-        return not self.__eq__(other)
-
-    def __hash__(self):
-        return hash(self.process_name)
-
-    def update_status(self):
-        self.open = any(
-            process.name() == self.process_name for process in psutil.process_iter()
-        )
-
-    def update_coordinates(self):
-        self.update_status()
-        if not self.open:
-            raise WoWnotFoundException(f"{self.process_name}  is closed")
-
-        windows = gw.getWindowsWithTitle(self.process_title)
-        if not windows:
-            raise WoWnotFoundException(
-                f"No windows with title {self.process_title} were found"
-            )
-
-        bbox = namedtuple("bbox", ["left", "top", "width", "height"])
-        self.bbox = bbox(*windows[0].box)
-        self.location = convert_bbox_to_location(self.bbox)
-
-
 @dataclass
 class Monitor:
     """Represents a monitor"""
@@ -89,6 +81,7 @@ class Monitor:
     bbox: Optional[namedtuple] = None
     location: Optional[namedtuple] = None
     image: Optional[Image] = None
+    frame: Optional[Frame] = None
     timestamp: Optional[datetime] = None
 
     def __repr__(self):
@@ -103,20 +96,23 @@ class Monitor:
     def __hash__(self):
         return hash(self.name)
 
-    def update_monitor_image(self):
+    def update_monitor_frame(self, capture_engine: Optional[CaptureEngine] = None):
         if not isinstance(self.number, int):
             raise ValueError(
                 f"Expecting a valid monitor number, got {self.number} instead"
             )
 
-        with mss() as sct:
-            monitor = sct.monitors[self.number]
-            sct_img = sct.grab(monitor)
-            # Convert to PIL Image
-            self.image = Image.frombytes(
-                "RGB", sct_img.size, sct_img.bgra, "raw", "BGRX"
-            )
-            self.timestamp = datetime.now()
+        if capture_engine is None:
+            with CaptureEngine() as engine:
+                return self.update_monitor_frame(engine)
+
+        self.frame = capture_engine.grab_monitor_frame(self.number)
+        self.timestamp = self.frame.timestamp
+
+    def update_monitor_image(self, capture_engine: Optional[CaptureEngine] = None):
+        self.update_monitor_frame(capture_engine)
+        # Convert to PIL Image
+        self.image = self.frame.to_pil()
 
 
 @dataclass
@@ -129,9 +125,28 @@ class SubImage:
     absolute_location: Optional[Location] = None
     absolute_bbox: Optional[BBox] = None
     found: bool = False
+    score: float = 0.0
     image: Optional[Image] = None
     timestamp: Optional[datetime] = None
 
+    # Template arrays prepared once from image, see prepare_template
+    path: Optional[Path] = None
+    bundled: Optional[BundledTemplate] = None
+    template_gray: Optional[np.ndarray] = None
+    template_bgr: Optional[np.ndarray] = None
+    pyramid_gray: List[np.ndarray] = field(default_factory=list)
+    pyramid_bgr: List[np.ndarray] = field(default_factory=list)
+    width: int = 0
+    height: int = 0
+    scale: float = 1.0
+    # Groups the sub-image belongs to, e.g. the data sub-folder it was loaded from
+    tags: Tuple[str, ...] = ()
+
+    # Last location the template was found at, searched first, see search
+    hot_location: Optional[Location] = None
+    search_stats: SearchStats = field(default_factory=SearchStats)
+    change_gate: ChangeGate = field(default_factory=ChangeGate)
+
     def __repr__(self):
         return f"SubImage Name: {self.name}\nLocation: {self.location}"
 
@@ -155,10 +170,62 @@ class SubImage:
         if not self.absolute_bbox and self.absolute_location:
             self.absolute_bbox = convert_location_to_bbox(self.absolute_location)
 
+    def get_source_templates(self) -> Tuple[np.ndarray, np.ndarray]:
+        """The BGR and grayscale templates at their captured scale"""
+        if self.bundled is not None:
+            return self.bundled.bgr, self.bundled.gray
+        return preprocess_template(self.image)
+
+    def prepare_template(self):
+        """Convert the template image once to the arrays used for matching"""
+        self.set_templates(*self.get_source_templates())
+        self.scale = 1.0
+
+    def set_templates(self, template_bgr: np.ndarray, template_gray: np.ndarray):
+        self.template_bgr, self.template_gray = template_bgr, template_gray
+        self.height, self.width = self.template_gray.shape[:2]
+        self.pyramid_gray = build_pyramid(self.template_gray, PYRAMID_LEVELS)
+        self.pyramid_bgr = build_pyramid(self.template_bgr, PYRAMID_LEVELS)
+        self.change_gate = ChangeGate()
+
+    def rescale(self, scale: float, cache_dir: Optional[Path] = None):
+        """
+        Rescale the template for a client of a different resolution.
+
+        Args:
+            scale (float): Factor relative to the captured template
+            cache_dir (Optional[Path]): On-disk cache of rescaled templates for this
+                resolution, required when scale is not 1
+        """
+        if scale == self.scale:
+            return
+
+        template_bgr, template_gray = self.get_source_templates()
+        if scale != 1.0:
+            template_bgr, template_gray = load_scaled_template(
+                self.name, self.path, template_bgr, template_gray, scale, cache_dir
+            )
+
+        self.set_templates(template_bgr, template_gray)
+        self.scale = scale
+        # Locations learned at another scale are meaningless
+        self.hot_location = None
+
+    def get_template(self, grayscale: bool = True) -> np.ndarray:
+        if self.template_gray is None:
+            self.prepare_template()
+        return self.template_gray if grayscale else self.template_bgr
+
+    def get_pyramid(self, grayscale: bool = True) -> List[np.ndarray]:
+        if self.template_gray is None:
+            self.prepare_template()
+        return self.pyramid_gray if grayscale else self.pyramid_bgr
+
     def update_image(self, client: "WoWclient"):
-        with mss() as _sct:
-            self.image = client.monitor.image.crop(self.location)
-            self.timestamp = datetime.now()
+        self.image = client.get_image().crop(self.location)
+        self.bundled = None
+        self.prepare_template()
+        self.timestamp = datetime.now()
 
     def update_location(
         self,
@@ -166,18 +233,39 @@ class SubImage:
         threshold=0.9,
         grayscale=True,
         update_image: bool = True,
+        frame: Optional[Frame] = None,
+        max_age: Optional[float] = None,
     ):
+        """
+        Look for the sub-image, in a snapshot by default.
+
+        Args:
+            client (WoWclient): Wow client
+            threshold (float): The matching threshold for image recognition
+            grayscale (bool): Whether to use grayscale for image recognition
+            update_image (bool): Take a snapshot, otherwise use the current frame
+            frame (Optional[Frame]): The frame to search, overrides update_image
+            max_age (Optional[float]): Snapshot freshness, see WoWclient.snapshot,
+                0 to look at the screen after an action
+        """
         self.location = None
         self.bbox = None
         self.absolute_location = None
         self.absolute_bbox = None
 
-        if not self.image:
+        if not self.image and self.bundled is None:
             return
 
-        self.found, self.location = find_image(
-            client, self.image, threshold, grayscale, update_image
-        )
+        if frame is None:
+            frame = client.snapshot(max_age) if update_image else client.get_frame()
+
+        # Repeated lookups on the same frame are served from the cache
+        result = client.match_cache.get(frame, self.name, threshold, grayscale)
+        if result is None:
+            result = self.search(client, frame, threshold, grayscale)
+            client.match_cache.put(frame, self.name, threshold, grayscale, result)
+
+        self.found, self.location, self.score = result
 
         if self.found:
             self.absolute_location = get_absolute_location(
@@ -187,6 +275,167 @@ class SubImage:
 
         self.timestamp = datetime.now()
 
+    def search(
+        self,
+        client: "WoWclient",
+        frame: Frame,
+        threshold: float = 0.9,
+        grayscale: bool = True,
+    ) -> MatchResult:
+        """
+        Match the template against a frame, trying its hot region first.
+
+        The hot region is the last location the template was found at, padded by
+        HOT_REGION_PADDING. The full frame is only searched when it misses, coarse
+        to fine if the client has pyramid_levels set.
+
+        With change gating, the previous result is reused as long as the region it
+        was computed from looks the same.
+        """
+        self.search_stats.evaluations += 1
+        key = (
+            threshold,
+            grayscale,
+            frame.size,
+            client.pyramid_levels,
+            client.hot_region_search,
+        )
+        if client.change_gating:
+            result = self.change_gate.lookup(frame, key)
+            if result is not None:
+                self.search_stats.gated_skips += 1
+                return result
+
+        result, region = self.match(client, frame, threshold, grayscale)
+        if client.change_gating:
+            self.change_gate.store(frame, key, region, result)
+
+        return result
+
+    def match(
+        self,
+        client: "WoWclient",
+        frame: Frame,
+        threshold: float = 0.9,
+        grayscale: bool = True,
+    ) -> Tuple[MatchResult, Location]:
+        """Match the template, returns the result and the region that decided it"""
+        template = self.get_template(grayscale)
+        image = frame.gray if grayscale else frame.bgr
+
+        if client.hot_region_search and self.hot_location:
+            region = pad_location(
+                self.hot_location, HOT_REGION_PADDING, frame.width, frame.height
+            )
+            result = locate_template(image, template, threshold, region)
+            if result[0]:
+                self.search_stats.region_hits += 1
+                return result, region
+            self.search_stats.region_misses += 1
+
+        if client.pyramid_levels:
+            result = locate_template_pyramid(
+                frame,
+                self.get_pyramid(grayscale),
+                threshold,
+                grayscale,
+                client.pyramid_levels,
+            )
+        else:
+            result = locate_template(image, template, threshold)
+        self.search_stats.full_searches += 1
+        if result[0]:
+            self.hot_location = result[1]
+
+        return result, Location(0, 0, frame.width, frame.height)
+
+
+def normalize_name(name: str) -> str:
+    """The key sub-images are looked up by"""
+    return name.lower().strip()
+
+
+class SubImageRegistry(list):
+    """
+    List of sub-images indexed by normalized name and by tag.
+
+    Behaves like the plain list it replaces, and keeps its indexes in sync as
+    sub-images are added or removed. When several sub-images share a name, lookups
+    return the first one, like get_image_from_list on a list. Tags are read when a
+    sub-image is added, so set them beforehand.
+    """
+
+    def __init__(self, sub_images: Iterable[SubImage] = ()):
+        super().__init__(sub_images)
+        self._reindex()
+
+    def _reindex(self):
+        self._names: Dict[str, SubImage] = {}
+        self._tags: Dict[str, Dict[str, SubImage]] = {}
+        for sub_image in self:
+            self._index(sub_image)
+
+    def _index(self, sub_image: SubImage):
+        key = normalize_name(sub_image.name)
+        self._names.setdefault(key, sub_image)
+        for tag in sub_image.tags:
+            self._tags.setdefault(normalize_name(tag), {}).setdefault(key, sub_image)
+
+    def get(self, name: str) -> Optional[SubImage]:
+        return self._names.get(normalize_name(name))
+
+    def has(self, name: str) -> bool:
+        return normalize_name(name) in self._names
+
+    def names(self) -> List[str]:
+        return [sub_image.name for sub_image in self._names.values()]
+
+    def tags(self) -> List[str]:
+        return list(self._tags)
+
+    def with_tag(self, tag: str) -> List[SubImage]:
+        """Sub-images carrying a tag, in the order they were added"""
+        return list(self._tags.get(normalize_name(tag), {}).values())
+
+    def append(self, sub_image: SubImage):
+        super().append(sub_image)
+        self._index(sub_image)
+
+    def extend(self, sub_images: Iterable[SubImage]):
+        for sub_image in sub_images:
+            self.append(sub_image)
+
+    def __iadd__(self, sub_images: Iterable[SubImage]):
+        self.extend(sub_images)
+        return self
+
+    # Removals and insertions can change which duplicate comes first, so they
+    # rebuild the indexes. They are rare compared to lookups.
+    def insert(self, index: int, sub_image: SubImage):
+        super().insert(index, sub_image)
+        self._reindex()
+
+    def remove(self, sub_image: SubImage):
+        super().remove(sub_image)
+        self._reindex()
+
+    def pop(self, index: int = -1) -> SubImage:
+        sub_image = super().pop(index)
+        self._reindex()
+        return sub_image
+
+    def clear(self):
+        super().clear()
+        self._reindex()
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._reindex()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._reindex()
+
 
 @dataclass
 class WoWclient:
@@ -199,10 +448,33 @@ class WoWclient:
     monitor: Optional[Monitor] = None
     monitor_relative_location: Optional[namedtuple] = None
     image: Optional[Image.Image] = None
+    frame: Optional[Frame] = None
     timestamp: Optional[datetime] = None
-
-    sub_images: List[SubImage] = field(default_factory=list)
-    movements: dict = field(default_factory=dict)
+    capture_engine: Optional[CaptureEngine] = None
+    capture_mode: str = WINDOW_CAPTURE
+    frame_max_age: float = FRAME_MAX_AGE
+    match_cache: MatchCache = field(default_factory=MatchCache)
+    capture_thread: Optional[CaptureThread] = None
+    hot_region_search: bool = True
+    pyramid_levels: int = 0
+    ui_scale: float = 1.0
+    change_gating: bool = True
+    match_executor: Optional[ThreadPoolExecutor] = None
+    scheduler: Optional[DetectorScheduler] = None
+    window_checked_at: float = 0.0
+    window_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    # The scheduler and bot threads both run batch matches
+    match_executor_lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False
+    )
+
+    sub_images: SubImageRegistry = field(default_factory=SubImageRegistry)
+    movements: Dict[str, MovementPlan] = field(default_factory=dict)
+    probes: Dict[str, PixelProbe] = field(default_factory=dict)
+
+    def __post_init__(self):
+        if not isinstance(self.sub_images, SubImageRegistry):
+            self.sub_images = SubImageRegistry(self.sub_images)
 
     def __repr__(self):
         return (
@@ -221,6 +493,31 @@ class WoWclient:
     def __hash__(self):
         return hash(self.process_name)
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_capture_engine(self) -> CaptureEngine:
+        """Returns the session capture engine, opening it on first use"""
+        if self.capture_engine is None or self.capture_engine.closed:
+            self.capture_engine = CaptureEngine()
+        return self.capture_engine
+
+    def close(self):
+        """Release the capture handles and matching threads held by the session"""
+        if self.scheduler is not None:
+            self.scheduler.stop()
+        self.stop_capture()
+        with self.match_executor_lock:
+            if self.match_executor is not None:
+                self.match_executor.shutdown(wait=False)
+                self.match_executor = None
+        if self.capture_engine is not None:
+            self.capture_engine.close()
+            self.capture_engine = None
+
     def find_screen(self):
         if not isinstance(self.wow_coordinates, WoWcoordinates):
             self.wow_coordinates = WoWcoordinates(
@@ -244,12 +541,11 @@ class WoWclient:
         self.monitor = Monitor(name=monitor.name, bbox=get_monitor_bbox(monitor))
         self.monitor.location = convert_bbox_to_location(self.monitor.bbox)
 
-        with mss() as sct:
-            mss_monitors = sct.monitors
-            for i in range(1, len(mss_monitors)):
-                monitor_bbox = get_mss_monitor_bbox(mss_monitors[i])
-                if monitor_bbox == self.monitor.bbox:
-                    self.monitor.number = i
+        mss_monitors = self.get_capture_engine().monitors
+        for i in range(1, len(mss_monitors)):
+            monitor_bbox = get_mss_monitor_bbox(mss_monitors[i])
+            if monitor_bbox == self.monitor.bbox:
+                self.monitor.number = i
 
         if not self.monitor.number:
             raise MonitorNotFoundException(
@@ -259,51 +555,257 @@ class WoWclient:
         self.monitor_relative_location = get_relative_location(
             self.monitor.bbox, self.wow_coordinates.bbox
         )
+        self.window_checked_at = time.monotonic()
+
+    def check_window(self, force: bool = False) -> bool:
+        """
+        Follow the client window when it is moved or resized.
+
+        Runs at most every WINDOW_CHECK_INTERVAL seconds, using the cached process
+        and window handle. A move within the same monitor only updates
+        monitor_relative_location, monitors are only searched again when the
+        window left its monitor. A resize also rescales the sub-images.
+
+        Args:
+            force (bool): Check even if the last check is recent
+
+        Returns:
+            bool: Whether the window moved or was resized
+        """
+        if not force and (
+            time.monotonic() - self.window_checked_at < WINDOW_CHECK_INTERVAL
+        ):
+            return False
+
+        # The capture thread and the bot thread may both get here
+        if not self.window_lock.acquire(blocking=False):
+            return False
+
+        try:
+            self.window_checked_at = time.monotonic()
+            previous_bbox = self.wow_coordinates.bbox
+            if not self.wow_coordinates.update_coordinates():
+                return False
+
+            bbox = self.wow_coordinates.bbox
+            resized = previous_bbox is None or previous_bbox[2:] != bbox[2:]
+            if self.monitor and is_subbox(self.monitor.bbox, bbox):
+                self.monitor_relative_location = get_relative_location(
+                    self.monitor.bbox, bbox
+                )
+            else:
+                self.find_screen()
+
+            if resized:
+                self.rescale_sub_images()
+                self.match_cache.clear()
+
+            return True
+        finally:
+            self.window_lock.release()
+
+    def get_capture_bbox(self) -> BBox:
+        """Absolute bbox of the client window, in mss coordinates"""
+        if not self.monitor_relative_location:
+            self.find_screen()
+
+        return BBox(
+            self.monitor.bbox.left + self.monitor_relative_location.left,
+            self.monitor.bbox.top + self.monitor_relative_location.top,
+            self.monitor_relative_location.right - self.monitor_relative_location.left,
+            self.monitor_relative_location.bottom - self.monitor_relative_location.top,
+        )
 
-    def update_client_image(self):
+    def capture_frame(self) -> Frame:
+        """Capture the client area without touching the current frame"""
         if not self.monitor_relative_location:
             self.find_screen()
+        else:
+            self.check_window()
+
+        if self.capture_mode == WINDOW_CAPTURE:
+            try:
+                return self.get_capture_engine().grab_frame(
+                    get_mss_region(self.get_capture_bbox())
+                )
+            except Exception as e:
+                print(f"Warning: window capture failed, using monitor capture: {e}")
+                self.capture_mode = MONITOR_CAPTURE
+
+        self.monitor.update_monitor_frame(self.get_capture_engine())
+        return self.monitor.frame.crop(self.monitor_relative_location)
+
+    def set_frame(self, frame: Frame) -> Frame:
+        # PIL images are only built on demand, see get_image
+        self.image = None
+        self.frame = frame
+        self.timestamp = frame.timestamp
+        return frame
 
-        self.monitor.update_monitor_image()
-        with mss() as _sct:
-            self.image = self.monitor.image.crop(self.monitor_relative_location)
-            self.timestamp = datetime.now()
+    def update_client_image(self):
+        return self.set_frame(self.capture_frame())
+
+    def start_capture(self, fps: float = CAPTURE_FPS):
+        """
+        Start capturing frames in the background.
+
+        Args:
+            fps (float): Capture rate of the producer thread
+        """
+        if not self.monitor_relative_location:
+            self.find_screen()
 
-    def load_sub_images(self):
-        """Load all images from the data directory and create SubImage objects"""
+        self.stop_capture()
+        self.capture_thread = CaptureThread(
+            self.capture_frame, self.get_capture_engine(), fps=fps
+        )
+        self.capture_thread.start()
+
+    def stop_capture(self):
+        if self.capture_thread is not None:
+            self.capture_thread.stop()
+            self.capture_thread = None
+
+    def snapshot(self, max_age: Optional[float] = None) -> Frame:
+        """
+        Returns a frame to be shared by every detector evaluated in the same tick.
+
+        Args:
+            max_age (Optional[float]): Reuse the current frame if it was captured
+                less than max_age seconds ago, defaults to frame_max_age
+
+        Returns:
+            Frame: The current frame, or a new capture if it is stale
+        """
+        max_age = self.frame_max_age if max_age is None else max_age
+
+        # Read from the background capture when it runs, waiting for the next
+        # frame only if the latest one is stale
+        capture_thread = self.capture_thread
+        if self.image is None and capture_thread and capture_thread.running:
+            frame = capture_thread.latest()
+            if frame is None or frame.age > max_age:
+                frame = capture_thread.wait_for_frame(newer_than=time.monotonic())
+            if frame is not None:
+                return self.set_frame(frame)
+
+        frame = self.get_frame() if self.image is not None else self.frame
+        if frame is None or frame.age > max_age:
+            frame = self.update_client_image()
+
+        return frame
+
+    def get_frame(self) -> Frame:
+        """
+        Returns the current client frame.
+
+        A PIL image assigned to `image` (e.g. a screenshot loaded from disk) takes
+        precedence over the last capture, and is wrapped into a frame once.
+        """
+        if self.image is not None and (
+            self.frame is None or self.frame.source is not self.image
+        ):
+            self.frame = Frame.from_pil(self.image)
+
+        if self.frame is None:
+            self.update_client_image()
+
+        return self.frame
+
+    def get_image(self) -> Image.Image:
+        """
+        Returns the current client frame as a PIL image.
+
+        The image is a view of the current frame, cached on it, rather than
+        assigned to `image`, so the frame keeps its capture time and later
+        snapshots still go through the capture thread.
+        """
+        if self.image is not None:
+            return self.image
+        return self.get_frame().to_pil()
+
+    def load_sub_images(self, bundle_path: Optional[Path] = None):
+        """
+        Load all images from the data directory and create SubImage objects.
+
+        Args:
+            bundle_path (Optional[Path]): Precompiled template bundle to load instead
+                of decoding every image, rebuilt when missing or stale. Its
+                templates are only read when first matched.
+        """
         # Path to the data directory (assuming the module structure from the screenshot)
         module_dir = Path(__file__).parent.parent
         data_dir = module_dir / "data"
 
-        # Common image extensions
-        image_extensions = [".png", ".jpg", ".jpeg"]
-
         if not data_dir.exists():
             print(f"Warning: Data directory not found at {data_dir}")
             return
 
-        # Load each image file and create a SubImage
-        for file_path in data_dir.iterdir():
-            if file_path.suffix.lower() in image_extensions and not get_image_from_list(
-                file_path.stem, self.sub_images, raise_error=False
-            ):
+        bundle = load_template_bundle(data_dir, bundle_path) if bundle_path else None
+        if bundle is not None:
+            for template in bundle.templates:
+                if not self.sub_images.has(template.name):
+                    self.sub_images.append(
+                        SubImage(
+                            name=template.name,
+                            path=data_dir / template.source,
+                            bundled=template,
+                            width=template.width,
+                            height=template.height,
+                            tags=template.tags,
+                        )
+                    )
+            self.rescale_sub_images()
+            return
+
+        # Load each image file and create a SubImage, sub-folders are used as tags
+        for file_path in get_template_sources(data_dir):
+            if not self.sub_images.has(file_path.stem):
                 try:
                     # Load the image using PIL
                     img = Image.open(file_path)
 
-                    # Create a SubImage with just the image attribute
+                    # Create a SubImage and prepare its template arrays
                     sub_image = SubImage(
                         name=file_path.stem,  # Using filename without extension as name
                         image=img,
+                        path=file_path,
+                        tags=file_path.relative_to(data_dir).parent.parts,
                     )
+                    sub_image.prepare_template()
 
                     # Add to the list
                     self.sub_images.append(sub_image)
                 except Exception as e:
                     print(f"Error loading image {file_path}: {e}")
 
+        self.rescale_sub_images()
+
+    def get_template_scale(self) -> float:
+        """Scale of the templates for the current client, from its window height"""
+        if not self.wow_coordinates or not self.wow_coordinates.bbox:
+            return 1.0
+        return get_template_scale(self.wow_coordinates.bbox.height, self.ui_scale)
+
+    def rescale_sub_images(self):
+        """Rescale every sub-image to the current client resolution"""
+        scale = self.get_template_scale()
+        if scale == 1.0 and all(img.scale == 1.0 for img in self.sub_images):
+            return
+
+        cache_dir = None
+        if scale != 1.0:
+            cache_dir = get_template_cache_dir(
+                self.wow_coordinates.bbox.height, self.ui_scale
+            )
+        for sub_image in self.sub_images:
+            try:
+                sub_image.rescale(scale, cache_dir)
+            except Exception as e:
+                print(f"Error rescaling image {sub_image.name}: {e}")
+
     def load_movements(self):
-        """Load all json files from the data directory and create keystroke records"""
+        """Load all json files from the movements directory as compiled movement plans"""
         # Path to the data directory (assuming the module structure from the screenshot)
         module_dir = Path(__file__).parent.parent
         movements_dir = module_dir / "movements"
@@ -318,12 +820,8 @@ class WoWclient:
                 file_path.stem
             ):
                 try:
-                    # Open and read the JSON file
-                    with open(file_path, "r") as f:
-                        movements_data = json.load(f)
-
-                    # Store the data in the movements dictionary using the filename (without extension) as the key
-                    self.movements[file_path.stem] = movements_data
+                    # Compiled once per file and mount state, shared between clients
+                    self.movements[file_path.stem] = load_movement_plan(file_path)
 
                     print(f"Loaded movement data from {file_path.name}")
                 except json.JSONDecodeError:
@@ -331,6 +829,45 @@ class WoWclient:
                 except Exception as e:
                     print(f"Error loading {file_path}: {str(e)}")
 
+    def save_calibration(self, path: Path = CALIBRATION_PATH):
+        """Save the hot regions learned by each sub-image"""
+        frame = self.frame
+        calibration = {
+            "client_size": list(frame.size) if frame else None,
+            "hot_regions": {
+                img.name: list(img.hot_location)
+                for img in self.sub_images
+                if img.hot_location
+            },
+        }
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(calibration, f, indent=2)
+
+    def load_calibration(self, path: Path = CALIBRATION_PATH):
+        """Load hot regions saved by a previous run, if the client size matches"""
+        if not path.exists():
+            return
+
+        try:
+            with open(path, "r") as f:
+                calibration = json.load(f)
+        except json.JSONDecodeError:
+            print(f"Error: Could not parse JSON in {path}")
+            return
+
+        client_size = calibration.get("client_size")
+        frame = self.get_frame()
+        if client_size and list(frame.size) != client_size:
+            print(f"Warning: Ignoring calibration made for a {client_size} client")
+            return
+
+        for name, location in calibration.get("hot_regions", {}).items():
+            sub_image = self.sub_images.get(name)
+            if sub_image:
+                sub_image.hot_location = Location(*location)
+
     def update_sub_image(
         self,
         name: str,
@@ -338,7 +875,7 @@ class WoWclient:
         grayscale: bool = True,
         update_client_image: bool = True,
     ):
-        image = get_image_from_list(name, self.sub_images)
+        image = self.get_sub_image(name)
         image.update_location(
             self,
             threshold=threshold,
@@ -352,17 +889,156 @@ class WoWclient:
         grayscale: bool = True,
         update_client_image: bool = True,
     ):
-        for img in self.sub_images:
-            img.update_location(
-                self,
-                threshold=threshold,
-                grayscale=grayscale,
-                update_image=update_client_image,
-            )
+        # Every sub-image is evaluated against the same frame
+        frame = self.snapshot() if update_client_image else self.get_frame()
+        self.match_sub_images(
+            [img.name for img in self.sub_images],
+            threshold=threshold,
+            grayscale=grayscale,
+            frame=frame,
+        )
 
-    def get_sub_image(self, name: str):
+    def match_sub_images(
+        self,
+        names: List[str],
+        threshold: float = 0.9,
+        grayscale: bool = True,
+        frame: Optional[Frame] = None,
+    ) -> Dict[str, MatchResult]:
+        """
+        Match several sub-images against one frame in parallel.
+
+        cv2.matchTemplate releases the GIL, so templates are searched concurrently
+        on a thread pool shared by the session.
+
+        Args:
+            names (List[str]): Names of the sub-images to locate
+            threshold (float): The matching threshold for image recognition
+            grayscale (bool): Whether to use grayscale for image recognition
+            frame (Optional[Frame]): The frame to search, defaults to a new snapshot
+
+        Returns:
+            Dict[str, MatchResult]: name -> (found, location, score)
+        """
+        frame = frame if frame is not None else self.snapshot()
+        sub_images = [self.get_sub_image(name) for name in names]
+
+        def match(sub_image: SubImage):
+            sub_image.update_location(self, threshold, grayscale, frame=frame)
+
+        if len(sub_images) > 1:
+            list(self.get_match_executor().map(match, sub_images))
+        else:
+            for sub_image in sub_images:
+                match(sub_image)
+
+        return {
+            name: (sub_image.found, sub_image.location, sub_image.score)
+            for name, sub_image in zip(names, sub_images)
+        }
+
+    def detect(
+        self,
+        names: List[str],
+        threshold: float = 0.9,
+        grayscale: bool = True,
+        frame: Optional[Frame] = None,
+    ) -> Dict[str, bool]:
+        """
+        Check which UI elements are visible, using pixel probes where possible.
+
+        Elements with a probe are decided from a few pixels; the ones without a
+        probe, or whose probe is ambiguous, escalate to template matching.
+
+        Args:
+            names (List[str]): Names of the elements to check
+            threshold (float): The matching threshold for escalated templates
+            grayscale (bool): Whether to use grayscale for escalated templates
+            frame (Optional[Frame]): The frame to check, defaults to a new snapshot
+
+        Returns:
+            Dict[str, bool]: name -> visible
+        """
+        frame = frame if frame is not None else self.snapshot()
+
+        detected = {}
+        escalated = []
+        for name in names:
+            probe = self.probes.get(name)
+            present = probe.evaluate(frame) if probe else None
+            if present is None:
+                escalated.append(probe.escalate_to if probe else name)
+            else:
+                detected[name] = present
+
+        if escalated:
+            # Probes may share a template, match each sub-image on a single thread
+            escalated = list(dict.fromkeys(escalated))
+            results = self.match_sub_images(escalated, threshold, grayscale, frame)
+            for name in names:
+                if name not in detected:
+                    probe = self.probes.get(name)
+                    detected[name] = results[probe.escalate_to if probe else name][0]
+
+        return detected
+
+    def calibrate_probe(
+        self,
+        name: str,
+        threshold: float = 0.9,
+        grayscale: bool = True,
+        frame: Optional[Frame] = None,
+    ) -> Optional[PixelProbe]:
+        """
+        Calibrate a pixel probe from a frame in which the sub-image is visible.
+
+        Returns:
+            Optional[PixelProbe]: The probe, or None if the sub-image was not found
+        """
+        frame = frame if frame is not None else self.snapshot()
+        sub_image = self.get_sub_image(name)
+        sub_image.update_location(self, threshold, grayscale, frame=frame)
+        if not sub_image.found:
+            return None
+
+        probe = PixelProbe.calibrate(sub_image.name, frame, sub_image.location)
+        self.probes[probe.name] = probe
+        return probe
+
+    def load_probes(self, path: Path = PROBES_PATH):
+        self.probes.update(load_probes(path))
+
+    def save_probes(self, path: Path = PROBES_PATH):
+        save_probes(self.probes, path)
+
+    def get_scheduler(self) -> DetectorScheduler:
+        """The detector scheduler of the session, see DetectorScheduler"""
+        if self.scheduler is None:
+            self.scheduler = DetectorScheduler(self)
+        return self.scheduler
+
+    def get_match_executor(self) -> ThreadPoolExecutor:
+        with self.match_executor_lock:
+            if self.match_executor is None:
+                self.match_executor = ThreadPoolExecutor(
+                    max_workers=MATCH_WORKERS, thread_name_prefix="avbot-match"
+                )
+            return self.match_executor
+
+    @property
+    def skip_rate(self) -> float:
+        """Share of template evaluations skipped because the frame did not change"""
+        evaluations = sum(img.search_stats.evaluations for img in self.sub_images)
+        skips = sum(img.search_stats.gated_skips for img in self.sub_images)
+        return skips / evaluations if evaluations else 0.0
+
+    def get_sub_image(self, name: str) -> SubImage:
         return get_image_from_list(name, self.sub_images)
 
+    def get_sub_images(self, tag: str) -> List[SubImage]:
+        """Sub-images carrying a tag, e.g. the name of their data sub-folder"""
+        return self.sub_images.with_tag(tag)
+
     def focus_client(self):
         focus_client(self)
 
@@ -372,68 +1048,49 @@ class WoWclient:
 
 def find_image(
     client: WoWclient,
-    template_image: Image.Image,
+    template_image: Union[Image.Image, np.ndarray],
     threshold: float = 0.9,
     grayscale: bool = True,
     update_image: bool = True,
+    frame: Optional[Frame] = None,
+    search_region: Optional[Location] = None,
 ) -> Tuple[bool, Optional[Location]]:
     """
     Search for a template image within the WoW client screen.
 
     Args:
         client (WoWclient): The WoW client instance
-        template_image (PIL.Image): The template image to search for
+        template_image (Union[PIL.Image, np.ndarray]): The template image to search for,
+            or an array already prepared for the requested color mode
         threshold (float): The matching threshold (0-1), higher values require closer matches
         grayscale (bool): Whether to convert images to grayscale before matching
         update_image (bool): Updates the image before attempting to locate the subimage
+        frame (Optional[Frame]): Frame shared with other detectors, see WoWclient.snapshot
+        search_region (Optional[Location]): Only search this part of the frame
 
     Returns:
         Tuple[bool, Optional[Location]]:
             - A boolean indicating if the image was found
             - If found, a Location namedtuple with left, top, right, bottom; None otherwise
     """
-    # Refresh the client image first
-    if update_image:
-        client.update_client_image()
-
-    # Convert PIL images to numpy arrays for OpenCV
-    client_img = np.array(client.image)
-    template_img = np.array(template_image)
-
-    # Convert images to BGR format for OpenCV
-    if client_img.shape[2] == 4:  # If RGBA
-        client_img = client_img[:, :, :3]
-    if template_img.shape[2] == 4:  # If RGBA
-        template_img = template_img[:, :, :3]
-
-    # Convert RGB to BGR (OpenCV format)
-    client_img = cv2.cvtColor(client_img, cv2.COLOR_RGB2BGR)
-    template_img = cv2.cvtColor(template_img, cv2.COLOR_RGB2BGR)
-
-    # Convert to grayscale if requested (improves matching in many cases)
-    if grayscale:
-        client_img = cv2.cvtColor(client_img, cv2.COLOR_BGR2GRAY)
-        template_img = cv2.cvtColor(template_img, cv2.COLOR_BGR2GRAY)
-
-    # Get template dimensions
-    h, w = template_img.shape[:2]
-
-    # Use template matching
-    method = cv2.TM_CCOEFF_NORMED
-    result = cv2.matchTemplate(client_img, template_img, method)
-
-    # Find the best match
-    min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
-
-    # For TM_CCOEFF_NORMED, the max value is our best match
-    if max_val >= threshold:
-        # Create a Location namedtuple (left, top, right, bottom)
-        match_location = Location(
-            left=max_loc[0], top=max_loc[1], right=max_loc[0] + w, bottom=max_loc[1] + h
-        )
-        return True, match_location
+    # Refresh the client image first, unless a snapshot was provided
+    if frame is None:
+        frame = client.snapshot() if update_image else client.get_frame()
+
+    # The client frame is converted straight from the BGRA capture buffer
+    client_img = frame.gray if grayscale else frame.bgr
+
+    # Templates loaded through SubImage are already converted
+    if isinstance(template_image, np.ndarray):
+        template_img = template_image
+    else:
+        template_bgr, template_gray = preprocess_template(template_image)
+        template_img = template_gray if grayscale else template_bgr
 
-    return False, None
+    found, match_location, _score = locate_template(
+        client_img, template_img, threshold, search_region
+    )
+    return found, match_location
 
 
 def get_image_from_list(
@@ -444,7 +1101,8 @@ def get_image_from_list(
 
     Args:
         name (str): The name of the SubImage to find
-        image_list (List[SubImage]): The list of SubImages to search
+        image_list (List[SubImage]): The list of SubImages to search, looked up
+            through its index when it is a SubImageRegistry
         raise_error (bool): Raises an error if the image is not found
 
     Returns:
@@ -453,9 +1111,15 @@ def get_image_from_list(
     Raises:
         ImageNotFoundException: If no SubImage with the given name is found
     """
-    for image in image_list:
-        if image.name.lower().strip() == name.lower().strip():
+    if isinstance(image_list, SubImageRegistry):
+        image = image_list.get(name)
+        if image is not None:
             return image
+    else:
+        key = normalize_name(name)
+        for image in image_list:
+            if normalize_name(image.name) == key:
+                return image
 
     if raise_error:
         raise ImageNotFoundException(f"SubImage with name '{name}' not found")
@@ -470,18 +1134,10 @@ def focus_client(client: WoWclient):
     Args:
         client (WoWclient): The WoW client instance
     """
-    wow_windows = gw.getWindowsWithTitle(client.process_title)
-    if not wow_windows:
-        print(f"Error: Could not find window with title '{client.process_title}'")
-        return
-
-    try:
-        wow_window = wow_windows[0]
-        wow_window.activate()
-        time.sleep(0.5)  # Give time for window to gain focus
-    except Exception as e:
-        print(f"Error focusing WoW window: {e}")
-        return
+    if isinstance(client.wow_coordinates, WoWcoordinates):
+        client.wow_coordinates.focus()
+    else:
+        focus_window(client.process_title)
 
 
 def reload_client(client: WoWclient, threshold: float = 0.9, grayscale: bool = True):
@@ -493,7 +1149,7 @@ def reload_client(client: WoWclient, threshold: float = 0.9, grayscale: bool = T
         threshold (float): The matching threshold for image recognition
         grayscale (bool): Whether to use grayscale for image recognition
     """
-    chat_typing_box = get_image_from_list("chat_typing_box", client.sub_images)
+    chat_typing_box = client.get_sub_image("chat_typing_box")
     chat_typing_box.update_location(client, threshold, grayscale)
     if chat_typing_box.found:
         # Click on the chat typing box
@@ -517,7 +1173,7 @@ def reload_client(client: WoWclient, threshold: float = 0.9, grayscale: bool = T
         time.sleep(0.5)  # Brief delay to ensure the chat opens
 
         # Verify that the chat typing box is now visible
-        chat_typing_box.update_location(client, threshold, grayscale)
+        chat_typing_box.update_location(client, threshold, grayscale, max_age=0)
         if not chat_typing_box.found:
             print("Error: Chat typing box not found after pressing enter")
             return
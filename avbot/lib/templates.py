@@ -0,0 +1,350 @@
+import json
+import os
+import struct
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from avbot.constants import (
+    REFERENCE_CLIENT_HEIGHT,
+    TEMPLATE_CACHE_DIR,
+    TEMPLATE_EXTENSIONS,
+    TEMPLATE_SCALE_TOLERANCE,
+)
+
+# Bundle layout: magic, format version, header length, JSON header, then the
+# template arrays, each starting on an ALIGNMENT byte boundary
+BUNDLE_MAGIC = b"AVBOTTPL"
+BUNDLE_VERSION = 2
+BUNDLE_PREFIX = struct.Struct("<8sIQ")
+ALIGNMENT = 64
+
+
+def preprocess_template(template_image: Image.Image) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert a template image to the arrays used by OpenCV.
+
+    Args:
+        template_image (PIL.Image): The template image
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The BGR and grayscale templates
+    """
+    template_img = np.array(template_image.convert("RGB"))
+
+    # Convert RGB to BGR (OpenCV format)
+    template_bgr = cv2.cvtColor(template_img, cv2.COLOR_RGB2BGR)
+    template_gray = cv2.cvtColor(template_bgr, cv2.COLOR_BGR2GRAY)
+
+    return template_bgr, template_gray
+
+
+def get_template_scale(client_height: int, ui_scale: float = 1.0) -> float:
+    """
+    Scale factor between the templates in avbot/data and the current client.
+
+    The WoW UI scales with the height of the client, and the templates were
+    captured on a REFERENCE_CLIENT_HEIGHT pixels high client.
+
+    Args:
+        client_height (int): Height of the client window in pixels
+        ui_scale (float): In-game UI scale relative to the one used for the captures
+
+    Returns:
+        float: The factor to apply to the templates, 1.0 when within tolerance
+    """
+    scale = client_height / REFERENCE_CLIENT_HEIGHT * ui_scale
+    if abs(scale - 1.0) <= TEMPLATE_SCALE_TOLERANCE:
+        return 1.0
+    return scale
+
+
+def rescale_template(template: np.ndarray, scale: float) -> np.ndarray:
+    """Resize a template, using area interpolation when shrinking it"""
+    h, w = template.shape[:2]
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+    return cv2.resize(template, size, interpolation=interpolation)
+
+
+def get_template_cache_dir(client_height: int, ui_scale: float = 1.0) -> Path:
+    return TEMPLATE_CACHE_DIR / f"{client_height}p_ui{ui_scale:g}"
+
+
+def load_scaled_template(
+    name: str,
+    source_path: Optional[Path],
+    template_bgr: np.ndarray,
+    template_gray: np.ndarray,
+    scale: float,
+    cache_dir: Path,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the rescaled BGR and grayscale templates, memory-mapped from the cache.
+
+    Rescaled arrays are written to cache_dir on first use, and reused on later runs
+    as long as the source image has not been modified since.
+
+    Args:
+        name (str): The template name
+        source_path (Optional[Path]): The source image, used for staleness checks
+        template_bgr (np.ndarray): The BGR template at its captured scale
+        template_gray (np.ndarray): The grayscale template at its captured scale
+        scale (float): The factor to apply, see get_template_scale
+        cache_dir (Path): Folder holding the templates of one resolution
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The rescaled BGR and grayscale templates
+    """
+    bgr_path = cache_dir / f"{name}_bgr.npy"
+    gray_path = cache_dir / f"{name}_gray.npy"
+    meta_path = cache_dir / f"{name}.json"
+    metadata = {
+        "scale": scale,
+        "source_mtime": source_path.stat().st_mtime if source_path else None,
+    }
+
+    try:
+        with open(meta_path, "r") as f:
+            cached_metadata = json.load(f)
+        if cached_metadata == metadata:
+            return (
+                np.load(bgr_path, mmap_mode="r"),
+                np.load(gray_path, mmap_mode="r"),
+            )
+    except (OSError, ValueError):
+        pass
+
+    scaled_bgr = rescale_template(template_bgr, scale)
+    scaled_gray = rescale_template(template_gray, scale)
+
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        np.save(bgr_path, scaled_bgr)
+        np.save(gray_path, scaled_gray)
+        with open(meta_path, "w") as f:
+            json.dump(metadata, f)
+    except OSError as e:
+        print(f"Warning: Could not cache rescaled template {name}: {e}")
+
+    return scaled_bgr, scaled_gray
+
+
+def get_template_sources(data_dir: Path) -> List[Path]:
+    """Template images in data_dir and its sub-folders, in a stable order"""
+    return [
+        file_path
+        for file_path in sorted(data_dir.rglob("*"))
+        if file_path.suffix.lower() in TEMPLATE_EXTENSIONS
+    ]
+
+
+def get_source_stamps(data_dir: Path) -> Dict[str, List[int]]:
+    """Modification time and size of every template source, keyed by relative path"""
+    stamps = {}
+    for file_path in get_template_sources(data_dir):
+        stat = file_path.stat()
+        stamps[file_path.relative_to(data_dir).as_posix()] = [
+            stat.st_mtime_ns,
+            stat.st_size,
+        ]
+    return stamps
+
+
+@dataclass
+class BundledTemplate:
+    """
+    A template stored in a TemplateBundle.
+
+    Arrays are views on the memory-mapped bundle, so pixels are only read from disk
+    when a template is first matched. They hold the template at its captured scale,
+    sub-images rescale them to the client like templates decoded from images.
+    """
+
+    name: str
+    source: str
+    tags: Tuple[str, ...] = ()
+    width: int = 0
+    height: int = 0
+    # kind -> (offset in the data section, shape)
+    arrays: Dict[str, Tuple[int, Tuple[int, ...]]] = field(default_factory=dict)
+    buffer: Optional[np.ndarray] = field(default=None, repr=False)
+
+    def get_array(self, kind: str) -> Optional[np.ndarray]:
+        if kind not in self.arrays:
+            return None
+        offset, shape = self.arrays[kind]
+        size = int(np.prod(shape))
+        return self.buffer[offset : offset + size].reshape(shape)
+
+    @property
+    def gray(self) -> np.ndarray:
+        return self.get_array("gray")
+
+    @property
+    def bgr(self) -> np.ndarray:
+        return self.get_array("bgr")
+
+
+class TemplateBundle:
+    """
+    Preprocessed templates compiled into a single memory-mapped file.
+
+    Built from avbot/data by build_template_bundle, so that startup does not have
+    to decode every image. The bundle records the modification time and size of
+    its sources to detect when it needs to be rebuilt.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        sources: Dict[str, List[int]],
+        templates: List[BundledTemplate],
+    ):
+        self.path = path
+        self.sources = sources
+        self.templates = templates
+
+    def __repr__(self):
+        return f"TemplateBundle | Path: {self.path} | Templates: {len(self.templates)}"
+
+    @classmethod
+    def open(cls, path: Path) -> "TemplateBundle":
+        """
+        Memory-map a bundle.
+
+        Raises:
+            ValueError: If the file is not a bundle of the current version
+        """
+        with open(path, "rb") as f:
+            prefix = f.read(BUNDLE_PREFIX.size)
+            if len(prefix) < BUNDLE_PREFIX.size:
+                raise ValueError(f"{path} is not a template bundle")
+            magic, version, header_size = BUNDLE_PREFIX.unpack(prefix)
+            if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+                raise ValueError(f"{path} is not a version {BUNDLE_VERSION} bundle")
+            header = json.loads(f.read(header_size))
+
+        buffer = None
+        if header["templates"]:
+            data_offset = _align(BUNDLE_PREFIX.size + header_size)
+            buffer = np.memmap(path, dtype=np.uint8, mode="r", offset=data_offset)
+        templates = [
+            BundledTemplate(
+                name=entry["name"],
+                source=entry["source"],
+                tags=tuple(entry["tags"]),
+                width=entry["width"],
+                height=entry["height"],
+                arrays={
+                    kind: (offset, tuple(shape))
+                    for kind, (offset, shape) in entry["arrays"].items()
+                },
+                buffer=buffer,
+            )
+            for entry in header["templates"]
+        ]
+        return cls(path, header["sources"], templates)
+
+    def is_stale(self, data_dir: Path) -> bool:
+        """Whether a source was added, removed or modified since the bundle was built"""
+        return self.sources != get_source_stamps(data_dir)
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def build_template_bundle(data_dir: Path, path: Path) -> TemplateBundle:
+    """
+    Compile the templates of a data directory into a bundle.
+
+    Args:
+        data_dir (Path): Folder holding the template images, sub-folders are tags
+        path (Path): Where to write the bundle
+
+    Returns:
+        TemplateBundle: The new bundle, memory-mapped
+    """
+    sources = get_source_stamps(data_dir)
+    entries = []
+    chunks = []
+    offset = 0
+    for file_path in get_template_sources(data_dir):
+        with Image.open(file_path) as image:
+            template_bgr, template_gray = preprocess_template(image)
+            arrays = {"gray": template_gray, "bgr": template_bgr}
+
+        layout = {}
+        for kind, array in arrays.items():
+            array = np.ascontiguousarray(array, dtype=np.uint8)
+            layout[kind] = [offset, list(array.shape)]
+            padding = _align(array.nbytes) - array.nbytes
+            chunks.extend([array.tobytes(), bytes(padding)])
+            offset += array.nbytes + padding
+
+        relative_path = file_path.relative_to(data_dir)
+        entries.append(
+            {
+                "name": file_path.stem,
+                "source": relative_path.as_posix(),
+                "tags": list(relative_path.parent.parts),
+                "width": template_gray.shape[1],
+                "height": template_gray.shape[0],
+                "arrays": layout,
+            }
+        )
+
+    header = json.dumps({"sources": sources, "templates": entries}).encode()
+    prefix = BUNDLE_PREFIX.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(header))
+    padding = _align(len(prefix) + len(header)) - len(prefix) - len(header)
+
+    # Write next to the bundle then swap, so a failed build never leaves half a file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(prefix + header + bytes(padding))
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp_path, path)
+
+    return TemplateBundle.open(path)
+
+
+def load_template_bundle(
+    data_dir: Path, path: Path, rebuild: bool = True
+) -> Optional[TemplateBundle]:
+    """
+    Open the bundle of a data directory, rebuilding it when missing or stale.
+
+    Args:
+        data_dir (Path): Folder holding the template images
+        path (Path): The bundle file
+        rebuild (bool): Rebuild the bundle instead of returning None when unusable
+
+    Returns:
+        Optional[TemplateBundle]: The bundle, None if it is unusable and not rebuilt
+    """
+    try:
+        bundle = TemplateBundle.open(path)
+        if not bundle.is_stale(data_dir):
+            return bundle
+        # Drop the mapping, Windows cannot replace a file that is still mapped
+        del bundle
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not open template bundle {path}: {e}")
+
+    if not rebuild:
+        return None
+
+    try:
+        return build_template_bundle(data_dir, path)
+    except OSError as e:
+        print(f"Warning: Could not build template bundle {path}: {e}")
+        return None
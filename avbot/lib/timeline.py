@@ -0,0 +1,207 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Iterable, NamedTuple, Optional
+
+import numpy as np
+
+from avbot.lib.inputs import InputBackend, get_input_backend
+from avbot.constants import TIMELINE_JITTER_SAMPLES, TIMELINE_SPIN
+
+# Timeline actions, a checkpoint sends nothing but is a point where a run may stop
+KEY_DOWN = "key_down"
+KEY_UP = "key_up"
+CHECKPOINT = "checkpoint"
+
+
+class TimelineEvent(NamedTuple):
+    """A key event, time is in seconds from the start of the timeline"""
+
+    time: float
+    action: str
+    key: Optional[str] = None
+
+
+@dataclass
+class TimelineStats:
+    """
+    How late events were sent compared to their deadline, and how long stopping
+    took from the stop event being set to the last key release, in seconds.
+
+    The executor lives as long as the process, so only running totals are kept,
+    percentiles are computed over the latest TIMELINE_JITTER_SAMPLES events.
+    """
+
+    events: int = 0
+    total_jitter: float = 0.0
+    max_jitter: float = 0.0
+    recent_jitters: Deque[float] = field(
+        default_factory=lambda: deque(maxlen=TIMELINE_JITTER_SAMPLES)
+    )
+    stops: int = 0
+    max_stop_latency: float = 0.0
+    last_stop_latency: Optional[float] = None
+
+    def __repr__(self):
+        return (
+            f"TimelineStats | Events: {self.events}"
+            f" | Mean jitter: {1000 * self.mean_jitter:.2f} ms"
+            f" | p95 jitter: {1000 * self.percentile(95):.2f} ms"
+            f" | Max jitter: {1000 * self.max_jitter:.2f} ms"
+            f" | Stops: {self.stops}"
+            f" | Max stop latency: {1000 * self.max_stop_latency:.2f} ms"
+        )
+
+    @property
+    def mean_jitter(self) -> float:
+        return self.total_jitter / self.events if self.events else 0.0
+
+    def percentile(self, q: float) -> float:
+        """Jitter percentile over the latest events"""
+        if not self.recent_jitters:
+            return 0.0
+        return float(np.percentile(self.recent_jitters, q))
+
+    def add_jitter(self, jitter: float):
+        self.events += 1
+        self.total_jitter += jitter
+        self.max_jitter = max(self.max_jitter, jitter)
+        self.recent_jitters.append(jitter)
+
+    def add_stop_latency(self, latency: float):
+        self.stops += 1
+        self.max_stop_latency = max(self.max_stop_latency, latency)
+        self.last_stop_latency = latency
+
+
+class StopEvent(threading.Event):
+    """A threading.Event that remembers when it was set, to measure stop latency"""
+
+    def __init__(self):
+        super().__init__()
+        self.set_at: Optional[float] = None
+
+    def set(self):
+        if self.set_at is None:
+            self.set_at = time.perf_counter()
+        super().set()
+
+    def clear(self):
+        self.set_at = None
+        super().clear()
+
+
+def sleep_until(
+    deadline: float,
+    spin: float = TIMELINE_SPIN,
+    stop_event: Optional[threading.Event] = None,
+) -> bool:
+    """
+    Wait until a time.perf_counter deadline, or until the stop event is set.
+
+    time.sleep may overshoot by a scheduler quantum, so it only covers the wait up
+    to spin seconds before the deadline. The rest is a spin that keeps yielding
+    the GIL to the capture and detector threads.
+
+    Returns:
+        bool: True once the deadline is reached, False if the stop event was set
+    """
+    remaining = deadline - time.perf_counter()
+    if remaining > spin:
+        if stop_event is None:
+            time.sleep(remaining - spin)
+        elif stop_event.wait(remaining - spin):
+            return False
+
+    while time.perf_counter() < deadline:
+        if stop_event is not None and stop_event.is_set():
+            return False
+        time.sleep(0)
+
+    return stop_event is None or not stop_event.is_set()
+
+
+class TimelineExecutor:
+    """
+    Sends key events at absolute deadlines.
+
+    Deadlines are offsets from the start of the run, so the time spent sending
+    input or waiting for the GIL delays one event but does not build up across
+    the timeline. The lateness of every event is recorded in stats.
+    """
+
+    def __init__(
+        self, backend: Optional[InputBackend] = None, spin: float = TIMELINE_SPIN
+    ):
+        """
+        Args:
+            backend (Optional[InputBackend]): Backend to send input through,
+                the current input backend by default
+            spin (float): Seconds before a deadline where sleeping turns to spinning
+        """
+        self.backend = backend
+        self.spin = spin
+        self.stats = TimelineStats()
+
+    def __repr__(self):
+        return f"TimelineExecutor | {self.stats}"
+
+    def run(
+        self,
+        events: Iterable[TimelineEvent],
+        stop_event: Optional[threading.Event] = None,
+    ) -> bool:
+        """
+        Send the events in order, each at its deadline.
+
+        Every wait is interrupted as soon as the stop event is set, then the keys
+        pressed during the run are released. They are also released if it fails.
+        With a StopEvent, the time from the event being set to the last key
+        release is recorded in stats.
+
+        Args:
+            events (Iterable[TimelineEvent]): Events sorted by time
+            stop_event (Optional[threading.Event]): Stops the run
+
+        Returns:
+            bool: True if every event was sent, False if the stop event was set
+        """
+        backend = self.backend or get_input_backend()
+        pressed = set()
+        completed = False
+        start = time.perf_counter()
+        try:
+            for event in events:
+                deadline = start + event.time
+                if not sleep_until(deadline, self.spin, stop_event):
+                    return False
+
+                self.stats.add_jitter(time.perf_counter() - deadline)
+                if event.action == KEY_DOWN:
+                    backend.key_down(event.key)
+                    pressed.add(event.key)
+                elif event.action == KEY_UP:
+                    backend.key_up(event.key)
+                    pressed.discard(event.key)
+
+            completed = True
+            return True
+        finally:
+            if not completed:
+                for key in pressed:
+                    backend.key_up(key)
+                set_at = getattr(stop_event, "set_at", None)
+                if set_at is not None:
+                    self.stats.add_stop_latency(time.perf_counter() - set_at)
+
+
+_executor: Optional[TimelineExecutor] = None
+
+
+def get_timeline_executor() -> TimelineExecutor:
+    """The executor movements and keystroke replays run on, keeping their stats"""
+    global _executor
+    if _executor is None:
+        _executor = TimelineExecutor()
+    return _executor
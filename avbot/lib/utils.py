@@ -1,15 +1,15 @@
 import math
-import time
-import keyboard
 import inspect
 import sys
 from collections import namedtuple
 from typing import Tuple, List, Dict, Optional, Callable
 from random import randint, uniform
 
-import pyautogui
 import numpy as np
 
+from avbot.lib.inputs import get_input_backend
+from avbot.lib.timeline import TimelineEvent, KEY_DOWN, KEY_UP, get_timeline_executor
+
 # Define the namedtuples once at module level
 Location = namedtuple("Location", ["left", "top", "right", "bottom"])
 BBox = namedtuple("BBox", ["left", "top", "width", "height"])
@@ -62,6 +62,16 @@ def get_mss_monitor_bbox(mss_monitors: dict) -> BBox:
     )
 
 
+def get_mss_region(bbox: BBox) -> dict:
+    """Convert a bounding box to an mss capture region"""
+    return {
+        "left": bbox.left,
+        "top": bbox.top,
+        "width": bbox.width,
+        "height": bbox.height,
+    }
+
+
 def is_subbox(bbox: BBox, sub_bbox: BBox) -> bool:
     """Checks if sub_bbox is inside bbox
 
@@ -121,6 +131,16 @@ def get_absolute_location(
     )
 
 
+def pad_location(location: Location, padding: int, width: int, height: int) -> Location:
+    """Grow a location by padding pixels on each side, clamped to width x height"""
+    return Location(
+        max(0, location.left - padding),
+        max(0, location.top - padding),
+        min(width, location.right + padding),
+        min(height, location.bottom + padding),
+    )
+
+
 def get_bbox_center(bbox: BBox) -> Tuple[int, int]:
     """Returns the coordinates of the center"""
     return round(bbox.left + bbox.width // 2), round(bbox.top + bbox.height // 2)
@@ -128,7 +148,8 @@ def get_bbox_center(bbox: BBox) -> Tuple[int, int]:
 
 def move_mouse(x, y):
     """Moves the mouse without being too obvious about the botting"""
-    current_x, current_y = pyautogui.position().x, pyautogui.position().y
+    backend = get_input_backend()
+    current_x, current_y = backend.position()
     distance = math.sqrt((x - current_x) ** 2 + (y - current_y) ** 2)
     noise_factor = math.ceil(0.01 * distance)
 
@@ -142,14 +163,14 @@ def move_mouse(x, y):
 
     duration = round(uniform(0.1, 0.2) / (n_points - 1), 10)
     for point_x, point_y in zip(points_x, points_y):
-        pyautogui.moveTo(point_x, point_y, duration=duration)
+        backend.move_to(point_x, point_y, duration=duration)
 
 
 def move_mouse_to_bbox(bbox: BBox, click: bool = True):
     x, y = get_bbox_center(bbox)
     move_mouse(x, y)
     if click:
-        pyautogui.click()
+        get_input_backend().click()
 
 
 def parse_keystrokes(keystrokes: List[dict]) -> List[dict]:
@@ -183,51 +204,29 @@ def perform_keystrokes(parsed_keystrokes: Optional[List[dict]]) -> bool:
     if not parsed_keystrokes:
         return False
 
-    # Keep track of which keys are currently pressed to ensure release on error
-    pressed_keys = set()
+    events = [
+        TimelineEvent(
+            keystroke["time"],
+            KEY_DOWN if keystroke["action"] == "press" else KEY_UP,
+            keystroke["key"],
+        )
+        for keystroke in parsed_keystrokes
+        if keystroke["action"] in ("press", "release")
+    ]
 
     try:
-        for i, keystroke in enumerate(parsed_keystrokes[:-1]):
-            # Perform the action
-            if keystroke["action"] == "press":
-                pyautogui.keyDown(keystroke["key"])
-                pressed_keys.add(keystroke["key"])
-            elif keystroke["action"] == "release":
-                pyautogui.keyUp(keystroke["key"])
-                pressed_keys.discard(
-                    keystroke["key"]
-                )  # Use discard instead of remove to avoid errors
-
-            waiting_time = parsed_keystrokes[i + 1]["time"] - keystroke["time"]
-            time.sleep(waiting_time)
-
-        # Handle the last keystroke
-        keystroke = parsed_keystrokes[-1]
-        if keystroke["action"] == "press":
-            pyautogui.keyDown(keystroke["key"])
-            pressed_keys.add(keystroke["key"])
-        elif keystroke["action"] == "release":
-            pyautogui.keyUp(keystroke["key"])
-            pressed_keys.discard(keystroke["key"])
-
-        return True
-
+        # Keys still pressed are released if the sequence fails
+        return get_timeline_executor().run(events)
     except Exception as e:
         print(f"Error during keystroke sequence: {e}")
-        # Release all keys that are still pressed to prevent them being stuck
-        for key in pressed_keys:
-            try:
-                pyautogui.keyUp(key)
-                print(f"Released key {key} after error")
-            except Exception as release_error:
-                print(f"Failed to release key {key}: {release_error}")
         return False
 
 
 def key_up_all(keys: List[str]):
+    backend = get_input_backend()
     for key in keys:
-        if keyboard.is_pressed(key):
-            pyautogui.keyUp(key)
+        if backend.is_pressed(key):
+            backend.key_up(key)
 
 
 def clear_keys():
@@ -240,8 +239,9 @@ def clear_keys():
 
     # Extract values for parameters ending with '_key'
     key_values = [value for name, value in locals_dict.items() if name.endswith("_key")]
+    backend = get_input_backend()
     for key in key_values:
-        pyautogui.keyUp(key)
+        backend.key_up(key)
 
     # Clear the keys
     key_up_all(key_values)
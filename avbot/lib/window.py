@@ -0,0 +1,141 @@
+import time
+from collections import namedtuple
+from dataclasses import dataclass, field
+from typing import Optional
+
+import psutil
+import pygetwindow as gw
+
+from avbot.lib.utils import convert_bbox_to_location
+from avbot.lib.exceptions import WoWnotFoundException
+
+
+@dataclass
+class WoWcoordinates:
+    """Represents the coordinates of a WoW client"""
+
+    process_name: str = "WowClassic.exe"
+    process_title: str = "World of Warcraft"
+    bbox: Optional[namedtuple] = None
+    location: Optional[namedtuple] = None
+    open: Optional[bool] = False
+
+    # Cached by update_status and get_window, rescanned only once they are gone
+    process: Optional[psutil.Process] = field(default=None, repr=False)
+    window: Optional["gw.Window"] = field(default=None, repr=False)
+    scans: int = 0
+
+    def __repr__(self):
+        return f"Process Name: {self.process_name}\nLocation: {self.location}"
+
+    def __eq__(self, other):
+        return (
+            self.process_name == other.process_name
+            and self.process_title == other.process_title
+        )
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.process_name)
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process else None
+
+    def update_status(self):
+        """
+        Check that the WoW process is running.
+
+        The process found by the last scan is checked first, psutil compares its
+        creation time so a recycled PID is not mistaken for it. Every process on
+        the system is only scanned when it is gone.
+        """
+        if self.process is not None and self.process.is_running():
+            self.open = True
+            return
+
+        self.window = None
+        self.process = next(
+            (
+                process
+                for process in psutil.process_iter(["name"])
+                if process.info["name"] == self.process_name
+            ),
+            None,
+        )
+        self.scans += 1
+        self.open = self.process is not None
+
+    def get_window(self) -> Optional["gw.Window"]:
+        """The WoW window, looked up again only when the cached handle is stale"""
+        if self.window is not None:
+            try:
+                if self.process_title in self.window.title:
+                    return self.window
+            except Exception:
+                pass
+
+        windows = gw.getWindowsWithTitle(self.process_title)
+        self.window = windows[0] if windows else None
+        return self.window
+
+    def update_coordinates(self) -> bool:
+        """
+        Update the window bbox.
+
+        Returns:
+            bool: Whether the window moved or was resized since the last update
+        """
+        self.update_status()
+        if not self.open:
+            raise WoWnotFoundException(f"{self.process_name}  is closed")
+
+        window = self.get_window()
+        if window is None:
+            raise WoWnotFoundException(
+                f"No windows with title {self.process_title} were found"
+            )
+
+        bbox = namedtuple("bbox", ["left", "top", "width", "height"])
+        new_bbox = bbox(*window.box)
+        changed = new_bbox != self.bbox
+        self.bbox = new_bbox
+        self.location = convert_bbox_to_location(self.bbox)
+        return changed
+
+    def focus(self):
+        """Bring the WoW window to the foreground, unless it already is"""
+        window = self.get_window()
+        if window is None:
+            print(f"Error: Could not find window with title '{self.process_title}'")
+            return
+
+        try:
+            if not window.isActive:
+                window.activate()
+                time.sleep(0.5)  # Give time for window to gain focus
+        except Exception as e:
+            print(f"Error focusing WoW window: {e}")
+
+
+def focus_window(title: str):
+    """
+    Focus the first window with a given title
+
+    Args:
+        title (str): The window title
+    """
+    windows = gw.getWindowsWithTitle(title)
+    if not windows:
+        print(f"Error: Could not find window with title '{title}'")
+        return
+
+    try:
+        window = windows[0]
+        window.activate()
+        time.sleep(0.5)  # Give time for window to gain focus
+    except Exception as e:
+        print(f"Error focusing WoW window: {e}")
+        return
@@ -0,0 +1,123 @@
+"""
+Measures how long each CLI command spends importing modules.
+
+Every scenario runs in a fresh interpreter under `python -X importtime`, importing
+avbot.app then the modules the command imports when it runs. The script reports
+the time spent on imports beyond the bare interpreter startup, and exits with an
+error when a scenario goes over its budget or loads a module it must not need.
+
+Keep SCENARIOS in sync with the imports made inside the commands of avbot/app.py.
+
+Usage:
+    python -m benchmarks.bench_import --repeats 5
+"""
+
+import argparse
+import subprocess
+import sys
+from typing import Dict, List
+
+# Command -> modules it imports when it runs
+SCENARIOS: Dict[str, List[str]] = {
+    "--help": [],
+    "move": ["avbot.lib.window", "avbot.lib.movements"],
+    "save-screen": ["avbot.lib.window", "avbot.lib.capture"],
+    "afk-av": ["avbot.lib.screen", "avbot.lib.battlegrounds"],
+}
+
+# Import time budget of each command, in milliseconds, about 25% over measured times
+BUDGETS: Dict[str, float] = {
+    "--help": 50.0,
+    "move": 110.0,
+    "save-screen": 120.0,
+    "afk-av": 160.0,
+}
+
+# Modules a command must not load: the capture and matching stack is lazy
+FORBIDDEN: Dict[str, List[str]] = {
+    "--help": ["cv2", "mss", "PIL", "numpy"],
+    "move": ["cv2", "mss", "PIL", "avbot.lib.capture"],
+    "save-screen": [
+        "avbot.lib.screen",
+        "avbot.lib.matching",
+        "avbot.lib.scheduler",
+        "avbot.lib.movements",
+        "avbot.lib.templates",
+        "avbot.lib.probes",
+    ],
+}
+
+
+def parse_importtime(output: str) -> Dict[str, int]:
+    """Cumulative microseconds of every top-level import in -X importtime output"""
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        # Nested imports are indented by two spaces per level
+        if name.startswith("  "):
+            continue
+        times[name.strip()] = int(cumulative_us)
+    return times
+
+
+def time_imports(modules: List[str]) -> Dict[str, int]:
+    """Top-level import times of a fresh interpreter importing modules"""
+    code = "; ".join(f"import {module}" for module in modules) or "pass"
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(process.stderr)
+
+
+def loaded_modules(modules: List[str], candidates: List[str]) -> List[str]:
+    """The candidates loaded by a fresh interpreter importing modules"""
+    code = "; ".join(f"import {module}" for module in ["sys"] + modules)
+    code += f"; print(*[m for m in {candidates!r} if m in sys.modules])"
+    process = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return process.stdout.split()
+
+
+def measure(modules: List[str], repeats: int) -> float:
+    """Best import time in milliseconds, excluding interpreter startup imports"""
+    best = None
+    for _ in range(repeats):
+        startup = time_imports([])
+        times = time_imports(["avbot.app"] + modules)
+        total = sum(us for name, us in times.items() if name not in startup)
+        best = total if best is None else min(best, total)
+    return best / 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    failures = []
+    for command, modules in SCENARIOS.items():
+        import_ms = measure(modules, args.repeats)
+        budget_ms = BUDGETS[command]
+        forbidden = loaded_modules(["avbot.app"] + modules, FORBIDDEN.get(command, []))
+        status = "ok" if import_ms <= budget_ms else "OVER BUDGET"
+        if forbidden:
+            status = f"LOADS {', '.join(forbidden)}"
+        print(
+            f"{command:>12} | imports {import_ms:7.1f} ms"
+            f" | budget {budget_ms:7.1f} ms | {status}"
+        )
+        if import_ms > budget_ms or forbidden:
+            failures.append(command)
+
+    if failures:
+        sys.exit(f"Over budget or loading forbidden modules: {', '.join(failures)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Compares coarse to fine pyramid matching with the exhaustive search.
+
+Every template in avbot/data is searched in every recorded frame of tests/data,
+and the script reports the average latency of each mode and whether the pyramid
+search agrees with the exhaustive one.
+
+Usage:
+    python -m benchmarks.bench_pyramid --levels 1 --threshold 0.75
+"""
+
+import argparse
+import time
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from avbot.lib.capture import Frame
+from avbot.lib.matching import MatchResult, locate_template, locate_template_pyramid
+from avbot.lib.screen import WoWclient
+from PIL import Image
+
+PROJECT_ROOT = Path(__file__).parent.parent
+PROJECT_TEST_DATA = PROJECT_ROOT / "tests" / "data"
+
+
+def time_call(func: Callable[[], MatchResult], repeats: int):
+    """Returns the last result of func and its average latency in milliseconds"""
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        result = func()
+    return result, 1000 * (time.perf_counter() - start_time) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--levels", type=int, default=1)
+    parser.add_argument("--threshold", type=float, default=0.75)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--color", action="store_true", help="Match BGR frames")
+    args = parser.parse_args()
+    grayscale = not args.color
+
+    client = WoWclient()
+    client.load_sub_images()
+
+    exhaustive_times, pyramid_times, agreements = [], [], []
+    for frame_path in sorted(PROJECT_TEST_DATA.glob("*.png")):
+        frame = Frame.from_pil(Image.open(frame_path))
+        image = frame.gray if grayscale else frame.bgr
+        frame.downscaled(args.levels, grayscale)
+
+        for sub_image in client.sub_images:
+            template = sub_image.get_template(grayscale)
+            pyramid = sub_image.get_pyramid(grayscale)
+
+            exhaustive, exhaustive_ms = time_call(
+                lambda: locate_template(image, template, args.threshold),
+                args.repeats,
+            )
+            pyramid_result, pyramid_ms = time_call(
+                lambda: locate_template_pyramid(
+                    frame, pyramid, args.threshold, grayscale, args.levels
+                ),
+                args.repeats,
+            )
+
+            agree = exhaustive[:2] == pyramid_result[:2]
+            exhaustive_times.append(exhaustive_ms)
+            pyramid_times.append(pyramid_ms)
+            agreements.append(agree)
+            print(
+                f"{frame_path.stem:>12} {sub_image.name:>24} | "
+                f"exhaustive {exhaustive_ms:7.1f} ms ({exhaustive[2]:.3f}) | "
+                f"pyramid {pyramid_ms:7.1f} ms ({pyramid_result[2]:.3f}) | "
+                f"{'agree' if agree else 'DISAGREE'}"
+            )
+
+    print(
+        f"\nAverage latency: exhaustive {np.mean(exhaustive_times):.1f} ms, "
+        f"pyramid {np.mean(pyramid_times):.1f} ms "
+        f"(x{np.mean(exhaustive_times) / np.mean(pyramid_times):.1f})"
+    )
+    print(f"Agreement: {np.mean(agreements):.0%} of {len(agreements)} searches")
+
+
+if __name__ == "__main__":
+    main()
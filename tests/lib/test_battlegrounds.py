@@ -1,9 +1,26 @@
+from pathlib import Path
+
+import numpy as np
 import pytest
+from PIL import Image
 
 from avbot.lib.screen import WoWclient
+from avbot.lib.capture import CaptureThread, Frame
+from avbot.lib.governor import LoopGovernor
+from avbot.lib.inputs import RecordingBackend, set_input_backend
 from avbot.lib.battlegrounds import (
     afk_bg,
+    BattlegroundStateMachine,
+    QUEUEING,
+    WAITING_FOR_GATES,
+    ROAMING,
+    DEAD,
+    ENDED,
 )
+from tests.constructs import build_wow_client_from_monitor_image
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+PROJECT_TEST_DATA = PROJECT_ROOT / "tests" / "data"
 
 
 @pytest.fixture
@@ -18,3 +35,123 @@ def wow_client():
 
 def test_afk_bg(wow_client):
     afk_bg(client=wow_client, n=3)
+
+
+@pytest.fixture
+def machine():
+    """A state machine on a recorded frame, with handlers that only log their calls"""
+    client = build_wow_client_from_monitor_image(PROJECT_TEST_DATA / "av_dead.png")
+    # The recorded frame never goes stale
+    client.get_scheduler().max_age = float("inf")
+    snapshots = []
+    snapshot = client.snapshot
+    client.snapshot = lambda max_age=None: snapshots.append(max_age) or snapshot(
+        max_age
+    )
+
+    machine = BattlegroundStateMachine(client, n=1)
+    # Pause as little as possible between ticks
+    machine.governor = LoopGovernor(tick_rate=1000.0, max_interval=0.001)
+    machine.calls = []
+    machine.snapshots = snapshots
+    for state, next_state in [
+        (QUEUEING, WAITING_FOR_GATES),
+        (ROAMING, ROAMING),
+        (DEAD, DEAD),
+        (ENDED, QUEUEING),
+    ]:
+        machine.handlers[state] = (
+            lambda status, state=state, next_state=next_state: machine.calls.append(
+                state
+            )
+            or next_state
+        )
+    yield machine
+    client.close()
+
+
+def test_state_machine_transitions(machine):
+    """Detections force transitions, each tick reads a single snapshot"""
+    # No detection outside of the battleground
+    machine.tick()
+    assert machine.state == WAITING_FOR_GATES
+    assert machine.calls == [QUEUEING]
+    assert machine.snapshots == []
+
+    # Dying interrupts any action, the dead handler runs on the next tick
+    machine.set_state(ROAMING)
+    machine.tick()
+    assert machine.state == DEAD
+    assert machine.calls == [QUEUEING]
+    assert len(machine.snapshots) == 1
+
+    machine.tick()
+    assert machine.state == DEAD
+    assert machine.calls == [QUEUEING, DEAD]
+    assert len(machine.snapshots) == 2
+
+    # The game ends
+    machine.client.image = Image.open(PROJECT_TEST_DATA / "av_end.png")
+    machine.tick()
+    assert machine.state == ENDED
+    machine.tick()
+    assert machine.state == QUEUEING
+    assert machine.calls == [QUEUEING, DEAD, ENDED]
+    assert len(machine.snapshots) == 3
+
+
+def test_state_machine_times(machine):
+    """Time is accounted per state and the run stops after n games"""
+    machine.games = machine.n
+    assert machine.finished
+
+    machine.set_state(ROAMING)
+    machine.set_state(DEAD)
+    assert machine.state_entries == {QUEUEING: 1, ROAMING: 1, DEAD: 1}
+    assert set(machine.state_times) == {QUEUEING, ROAMING}
+    assert machine.time_in(DEAD) >= 0
+    assert "Games per hour" in machine.report()
+
+
+def test_leave_retries_until_found(machine, monkeypatch):
+    """The game only counts once the leave button was clicked"""
+    monkeypatch.setattr("avbot.lib.battlegrounds.time.sleep", lambda seconds: None)
+    # Keep the real cursor where it is
+    moves = []
+    monkeypatch.setattr("avbot.lib.utils.move_mouse", lambda x, y: moves.append((x, y)))
+    backend = RecordingBackend()
+    previous = set_input_backend(backend)
+    machine.handlers[ENDED] = machine.leave
+    machine.client.frame_max_age = float("inf")
+    try:
+        machine.set_state(ENDED)
+        machine.tick()
+        assert machine.state == ENDED
+        assert machine.games == 0
+
+        machine.client.image = Image.open(PROJECT_TEST_DATA / "av_end.png")
+        machine.tick()
+        assert machine.state == QUEUEING
+        assert machine.games == 1
+        assert [event[1] for event in backend.events].count("click") == 1
+        assert len(moves) == 1
+    finally:
+        set_input_backend(previous)
+
+
+def test_capture_paused_while_queueing(machine):
+    """The background capture only runs in the battleground"""
+    capture_thread = CaptureThread(
+        lambda: Frame(np.zeros((10, 10, 4), dtype=np.uint8)), fps=10.0
+    )
+    capture_thread.start()
+    machine.client.capture_thread = capture_thread
+    restarts = []
+    machine.client.start_capture = restarts.append
+
+    machine.update_capture()
+    assert not capture_thread.running
+    assert machine.client.capture_thread is None
+
+    machine.set_state(WAITING_FOR_GATES)
+    assert restarts == [10.0]
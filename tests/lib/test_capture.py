@@ -0,0 +1,135 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from avbot.lib.capture import BufferPool, CaptureEngine, CaptureThread, Frame
+from avbot.lib.screen import WoWclient
+
+
+def test_capture_engine_reuses_handles():
+    """
+    Tests that grabs on a thread share a single capture handle
+    Requires a monitor
+    """
+    with CaptureEngine() as engine:
+        handle = engine.sct
+        engine.grab_monitor(1)
+        engine.grab_monitor(1)
+        assert engine.sct is handle
+
+        # Other threads get their own handle
+        handles = []
+        thread = threading.Thread(target=lambda: handles.append(engine.sct))
+        thread.start()
+        thread.join()
+        assert handles[0] is not handle
+
+    assert engine.closed
+    with pytest.raises(RuntimeError):
+        engine.grab_monitor(1)
+
+
+def test_frame_conversions():
+    """Tests that frames convert from BGRA without going through PIL"""
+    bgra = np.random.randint(0, 255, size=(90, 120, 4), dtype=np.uint8)
+    frame = Frame(bgra, BufferPool())
+
+    assert np.shares_memory(frame.bgra, bgra)
+    assert np.array_equal(frame.gray, cv2.cvtColor(bgra, cv2.COLOR_BGRA2GRAY))
+    assert np.array_equal(frame.bgr, bgra[:, :, :3])
+
+    cropped = frame.crop((10, 20, 60, 80))
+    assert cropped.size == (50, 60)
+    assert np.shares_memory(cropped.bgra, bgra)
+    assert cropped.to_pil().size == (50, 60)
+
+
+def test_buffer_pool_recycles_collected_frames():
+    """Conversion buffers are only reused once the frame holding them is gone"""
+    pool = BufferPool()
+    bgra = np.random.randint(0, 255, size=(90, 120, 4), dtype=np.uint8)
+    frames = [Frame(bgra.copy(), pool) for _ in range(5)]
+    grays = [frame.gray for frame in frames]
+    assert len({id(gray) for gray in grays}) == 5
+    expected = grays[0].copy()
+    assert all(np.array_equal(gray, expected) for gray in grays)
+
+    buffer_id = id(grays[-1])
+    del frames[-1], grays[-1]
+    assert id(Frame(bgra, pool).gray) == buffer_id
+
+
+def test_capture_thread_ring():
+    """Tests that the producer keeps the latest frames available without blocking"""
+
+    def grab():
+        return Frame(np.zeros((10, 10, 4), dtype=np.uint8))
+
+    capture_thread = CaptureThread(grab, fps=100.0, depth=2)
+    capture_thread.start()
+    try:
+        frame = capture_thread.wait_for_frame(newer_than=time.monotonic(), timeout=1.0)
+        assert frame is not None
+        newer = capture_thread.wait_for_frame(newer_than=frame.captured_at + 1e-6)
+        assert newer.frame_id > frame.frame_id
+        assert capture_thread.latest().frame_id >= newer.frame_id
+        assert len(capture_thread.frames) <= 2
+    finally:
+        capture_thread.stop()
+
+    assert not capture_thread.running
+
+
+def test_snapshot_reuses_fresh_frames():
+    """Snapshots read the latest frame, and only wait for a new one when asked to"""
+
+    def grab():
+        return Frame(np.zeros((10, 10, 4), dtype=np.uint8))
+
+    capture_thread = CaptureThread(grab, fps=10.0, depth=2)
+    client = WoWclient(capture_thread=capture_thread)
+    capture_thread.start()
+    try:
+        latest = capture_thread.wait_for_frame(newer_than=time.monotonic(), timeout=1.0)
+        assert client.snapshot().frame_id == latest.frame_id
+        assert client.snapshot(max_age=0).frame_id > latest.frame_id
+    finally:
+        capture_thread.stop()
+
+
+def test_get_image_keeps_capture_time():
+    """Reading the frame as a PIL image does not make it look fresh"""
+    frame = Frame(
+        np.zeros((10, 10, 4), dtype=np.uint8), captured_at=time.monotonic() - 5.0
+    )
+    capture_thread = CaptureThread(
+        lambda: Frame(np.zeros((10, 10, 4), dtype=np.uint8)), fps=10.0
+    )
+    client = WoWclient(capture_thread=capture_thread)
+    client.set_frame(frame)
+
+    image = client.get_image()
+    assert image.size == (10, 10)
+    assert client.get_image() is image
+    assert client.image is None
+    assert client.get_frame() is frame and frame.age >= 5.0
+
+    # A stale frame is still replaced by the capture thread
+    capture_thread.start()
+    try:
+        assert client.snapshot(max_age=1.0) is not frame
+    finally:
+        capture_thread.stop()
+
+
+def test_signature_covers_edge_cells():
+    """Cells cut short by the frame edges are part of the signature"""
+    bgra = np.zeros((10, 10, 4), dtype=np.uint8)
+    bgra[8:, 8:] = 255
+    grid = Frame(bgra).signature(4)
+    assert grid.shape == (3, 3)
+    assert grid[2, 2] == 255
+    assert grid[:2].max() == 0 and grid[:, :2].max() == 0
@@ -2,6 +2,7 @@ from pathlib import Path
 from collections import namedtuple
 
 from avbot.lib.screen import WoWcoordinates, WoWclient
+from avbot.lib.capture import MONITOR_CAPTURE
 
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 PROJECT_TEST_OUTPUTS = PROJECT_ROOT / "tests" / "outputs"
@@ -26,7 +27,23 @@ def test_wow_client():
     Requires WoW open on a 24inches 2k monitor
     """
     # Screenshots of the monitor and WoW client
+    wow_client = WoWclient(capture_mode=MONITOR_CAPTURE)
+    wow_client.find_screen()
+    wow_client.update_client_image()
+    wow_client.monitor.frame.to_pil().save(
+        PROJECT_TEST_OUTPUTS / "monitor_screenshot.png"
+    )
+
+
+def test_wow_client_window_capture():
+    """
+    Tests that window capture yields the client area only
+    Requires WoW open on a 24inches 2k monitor
+    """
     wow_client = WoWclient()
     wow_client.find_screen()
     wow_client.update_client_image()
-    wow_client.monitor.image.save(PROJECT_TEST_OUTPUTS / "monitor_screenshot.png")
+
+    bbox = wow_client.get_capture_bbox()
+    assert wow_client.get_frame().size == (bbox.width, bbox.height)
+    assert wow_client.monitor.frame is None
@@ -0,0 +1,79 @@
+import pytest
+
+from avbot.lib.governor import LoopGovernor
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake wall and CPU clocks, pausing only advances the wall clock"""
+    state = {"wall": 0.0, "cpu": 0.0, "sleeps": []}
+
+    class Event:
+        """A pause that is interrupted right away once set"""
+
+        def __init__(self):
+            self.flag = False
+
+        def set(self):
+            self.flag = True
+
+        def clear(self):
+            self.flag = False
+
+        def wait(self, seconds):
+            if not self.flag:
+                state["sleeps"].append(seconds)
+                state["wall"] += seconds
+            return self.flag
+
+    monkeypatch.setattr("avbot.lib.governor.time.monotonic", lambda: state["wall"])
+    monkeypatch.setattr("avbot.lib.governor.time.thread_time", lambda: state["cpu"])
+    monkeypatch.setattr("avbot.lib.governor.threading.Event", Event)
+    return state
+
+
+def test_backoff_and_transitions(clock):
+    """The pause grows while the state is stable and resets when it changes"""
+    governor = LoopGovernor(tick_rate=10.0, max_interval=0.4, backoff=2.0)
+
+    assert governor.wait("alive") == 0.0
+    assert [governor.wait("alive") for _ in range(4)] == pytest.approx(
+        [0.1, 0.2, 0.4, 0.4]
+    )
+    assert governor.wait("dead") == 0.0
+    assert governor.wait("dead") == pytest.approx(0.1)
+    assert governor.transitions == 1
+
+    # Time spent in the loop body counts towards the pause
+    clock["wall"] += 0.15
+    assert governor.wait("dead") == pytest.approx(0.05)
+
+
+def test_cpu_budget(clock):
+    """Busy iterations are followed by a pause keeping CPU usage in budget"""
+    governor = LoopGovernor(tick_rate=10.0, cpu_budget=0.25)
+    assert governor.wait("alive") == 0.0
+
+    clock["wall"] += 0.1
+    clock["cpu"] += 0.1
+    assert governor.wait("alive") == pytest.approx(0.3)
+    assert governor.cpu_share == pytest.approx(0.25)
+    assert governor.cpu_per_tick == pytest.approx(0.05)
+
+
+def test_cpu_budget_is_bounded(clock):
+    """Transitions are not stretched, and pauses stay interruptible and short"""
+    governor = LoopGovernor(tick_rate=10.0, cpu_budget=0.25, max_interval=2.0)
+
+    # A long, busy tick, e.g. moving through the battleground
+    clock["wall"] += 60.0
+    clock["cpu"] += 30.0
+    assert governor.wait("roaming") == 0.0
+
+    clock["wall"] += 60.0
+    clock["cpu"] += 30.0
+    assert governor.wait("roaming") == pytest.approx(2.0)
+
+    governor.interrupt()
+    assert governor.wait("roaming") == 0.0
+    assert governor.wait("roaming") > 0.0
@@ -1,7 +1,27 @@
+import shutil
+import threading
+
 import pytest
+import numpy as np
 from pathlib import Path
 from collections import namedtuple
 
+from PIL import Image
+
+from avbot.lib.exceptions import ImageNotFoundException
+from avbot.lib.screen import (
+    SubImage,
+    SubImageRegistry,
+    WoWclient,
+    WoWcoordinates,
+    get_image_from_list,
+)
+from avbot.lib.templates import (
+    TemplateBundle,
+    load_template_bundle,
+    preprocess_template,
+)
+from avbot.lib.utils import Location
 from tests.constructs import build_wow_client_from_monitor_image
 
 PROJECT_ROOT = Path(__file__).parent.parent.parent
@@ -39,3 +59,268 @@ def test_subimage_recognition(client_image_name, subimage_name):
     located_images = [img.name for img in client.sub_images if img.found]
     assert len(located_images) == 1
     assert located_images[0].lower() == subimage_name.lower()
+
+
+def test_sub_images_are_preprocessed():
+    """Templates are converted once at load time"""
+    client = build_wow_client_from_monitor_image(PROJECT_TEST_DATA / "av_dead.png")
+
+    for sub_image in client.sub_images:
+        assert sub_image.template_gray.shape == (sub_image.height, sub_image.width)
+        assert sub_image.template_bgr.shape == (sub_image.height, sub_image.width, 3)
+        assert sub_image.image.size == (sub_image.width, sub_image.height)
+        assert sub_image.path.stem == sub_image.name
+
+
+def test_snapshot_is_shared():
+    """Detectors evaluated within the freshness window share one frame"""
+    client = build_wow_client_from_monitor_image(PROJECT_TEST_DATA / "av_dead.png")
+
+    frame = client.snapshot(max_age=60)
+    assert client.snapshot(max_age=60) is frame
+
+    resurrection = client.get_sub_image("resurrection")
+    resurrection.update_location(client, frame=frame)
+    assert resurrection.found
+
+
+def test_match_cache():
+    """Repeated lookups on the same frame skip template matching"""
+    client = build_wow_client_from_monitor_image(PROJECT_TEST_DATA / "av_dead.png")
+    client.match_cache.reset_stats()
+
+    cancel_res = client.get_sub_image("cancel_res")
+    for _ in range(3):
+        cancel_res.update_location(client, threshold=0.75, update_image=False)
+        assert cancel_res.found
+
+    assert client.match_cache.misses == 1
+    assert client.match_cache.hits == 2
+
+    # A new frame invalidates the cache
+    swapped = build_wow_client_from_monitor_image(PROJECT_TEST_DATA / "av_end.png")
+    client.image = swapped.image
+    cancel_res.update_location(client, threshold=0.75, update_image=False)
+    assert not cancel_res.found
+    assert client.match_cache.misses == 2
+
+
+def test_hot_region_search(tmp_path):
+    """Templates are searched around their last location first"""
+    client = build_wow_client_from_monitor_image(PROJECT_TEST_DATA / "av_dead.png")
+    client.change_gating = False
+    resurrection = client.get_sub_image("resurrection")
+
+    resurrection.update_location(client, update_image=False)
+    assert resurrection.found
+    assert resurrection.hot_location == resurrection.location
+
+    client.match_cache.clear()
+    resurrection.update_location(client, update_image=False)
+    assert resurrection.found
+    assert resurrection.search_stats.region_hits == 1
+    assert resurrection.search_stats.full_searches == 1
+
+    # Learned regions survive a restart
+    calibration_path = tmp_path / "hot_regions.json"
+    client.save_calibration(calibration_path)
+    fresh_client = build_wow_client_from_monitor_image(
+        PROJECT_TEST_DATA / "av_dead.png"
+    )
+    fresh_client.load_calibration(calibration_path)
+    assert (
+        fresh_client.get_sub_image("resurrection").hot_location
+        == resurrection.hot_location
+    )
+
+
+@pytest.mark.parametrize(
+    "client_image_name, expected",
+    [
+        ("av_dead", {"resurrection": True, "leave_battleground": False}),
+        ("av_end", {"resurrection": False, "leave_battleground": True}),
+    ],
+)
+def test_match_sub_images(client_image_name, expected):
+    """Batch matching returns one result per template for a shared frame"""
+    client = build_wow_client_from_monitor_image(
+        PROJECT_TEST_DATA / f"{client_image_name}.png"
+    )
+    results = client.match_sub_images(list(expected), frame=client.get_frame())
+
+    for name, found in expected.items():
+        assert results[name][0] == found
+        assert (results[name][1] is not None) == found
+        assert client.get_sub_image(name).score == results[name][2]
+    client.close()
+
+
+def test_match_executor_is_shared():
+    """Threads asking for the match executor at once get the same one"""
+    client = WoWclient()
+    barrier = threading.Barrier(8)
+    executors = []
+
+    def get_executor():
+        barrier.wait()
+        executors.append(client.get_match_executor())
+
+    threads = [threading.Thread(target=get_executor) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(executor) for executor in executors}) == 1
+    client.close()
+    assert client.match_executor is None
+
+
+@pytest.mark.parametrize("client_image_name", ["av_dead", "av_end"])
+def test_pyramid_matches_exhaustive_search(client_image_name):
+    """Coarse to fine matching finds the same templates as the exhaustive search"""
+    client = build_wow_client_from_monitor_image(
+        PROJECT_TEST_DATA / f"{client_image_name}.png"
+    )
+    client.hot_region_search = False
+    names = [img.name for img in client.sub_images]
+
+    exhaustive = client.match_sub_images(
+        names, threshold=0.75, frame=client.get_frame()
+    )
+    client.match_cache.clear()
+    client.pyramid_levels = 1
+    pyramid = client.match_sub_images(names, threshold=0.75, frame=client.get_frame())
+
+    for name in names:
+        assert pyramid[name][:2] == exhaustive[name][:2]
+    client.close()
+
+
+def test_rescaled_templates(tmp_path, monkeypatch):
+    """Templates are rescaled for a 1080p client, then reused from the disk cache"""
+    monkeypatch.setattr("avbot.lib.templates.TEMPLATE_CACHE_DIR", tmp_path)
+    client_image = Image.open(PROJECT_TEST_DATA / "av_dead.png").resize(
+        (1920, 1080), Image.LANCZOS
+    )
+
+    for memory_mapped in [False, True]:
+        client = WoWclient(
+            wow_coordinates=WoWcoordinates(
+                bbox=BBox(0, 0, 1920, 1080), location=Location(0, 0, 1920, 1080)
+            ),
+            image=client_image,
+        )
+        client.load_sub_images()
+        resurrection = client.get_sub_image("resurrection")
+        assert resurrection.scale == 0.75
+        assert isinstance(resurrection.template_gray, np.memmap) == memory_mapped
+
+        resurrection.update_location(client, update_image=False)
+        assert resurrection.found
+
+
+def test_change_gating():
+    """Unchanged regions reuse the previous result without matching"""
+    client = build_wow_client_from_monitor_image(PROJECT_TEST_DATA / "av_dead.png")
+    dead_image = client.image
+    end_image = Image.open(PROJECT_TEST_DATA / "av_end.png")
+    resurrection = client.get_sub_image("resurrection")
+
+    # Same pixels in a new frame
+    for image in [dead_image, dead_image.copy()]:
+        client.image = image
+        resurrection.update_location(client, update_image=False)
+        assert resurrection.found
+    assert resurrection.search_stats.gated_skips == 1
+
+    # The dialog is gone
+    client.image = end_image
+    resurrection.update_location(client, update_image=False)
+    assert not resurrection.found
+    assert resurrection.search_stats.gated_skips == 1
+    assert client.skip_rate > 0
+
+
+def test_sub_image_registry():
+    """Sub-images are looked up by normalized name and tag, in sync with the list"""
+    registry = SubImageRegistry(
+        [SubImage(name="Resurrection", tags=("av",)), SubImage(name="cancel_res")]
+    )
+    registry.append(SubImage(name="leave_battleground", tags=("av", "end")))
+
+    assert registry.get(" resurrection ").name == "Resurrection"
+    assert get_image_from_list("LEAVE_battleground", registry).tags == ("av", "end")
+    assert [img.name for img in registry.with_tag("AV")] == [
+        "Resurrection",
+        "leave_battleground",
+    ]
+
+    registry.remove(registry.get("resurrection"))
+    assert not registry.has("resurrection")
+    assert [img.name for img in registry.with_tag("av")] == ["leave_battleground"]
+    with pytest.raises(ImageNotFoundException):
+        get_image_from_list("resurrection", registry)
+
+    # Plain lists keep working
+    client = WoWclient(sub_images=list(registry))
+    assert isinstance(client.sub_images, SubImageRegistry)
+    assert client.get_sub_image("cancel_res") is registry[0]
+
+
+def test_template_bundle(tmp_path):
+    """Bundled templates match the decoded images and are rebuilt when stale"""
+    data_dir = tmp_path / "data"
+    (data_dir / "av").mkdir(parents=True)
+    for name in ["resurrection", "cancel_res"]:
+        shutil.copy(PACKAGE_DATA / f"{name}.png", data_dir / "av" / f"{name}.png")
+    bundle_path = tmp_path / "templates.bundle"
+
+    bundle = load_template_bundle(data_dir, bundle_path)
+    assert [template.name for template in bundle.templates] == [
+        "cancel_res",
+        "resurrection",
+    ]
+    for template in bundle.templates:
+        template_bgr, template_gray = preprocess_template(
+            Image.open(data_dir / template.source)
+        )
+        assert isinstance(template.gray, np.memmap)
+        assert np.array_equal(template.gray, template_gray)
+        assert np.array_equal(template.bgr, template_bgr)
+        assert template.tags == ("av",)
+    assert not TemplateBundle.open(bundle_path).is_stale(data_dir)
+
+    shutil.copy(PACKAGE_DATA / "join_battle.png", data_dir / "join_battle.png")
+    assert TemplateBundle.open(bundle_path).is_stale(data_dir)
+    assert len(load_template_bundle(data_dir, bundle_path).templates) == 3
+
+
+def test_sub_images_from_bundle(tmp_path):
+    """Templates loaded from the bundle are only prepared when first matched"""
+    client = WoWclient(
+        wow_coordinates=WoWcoordinates(
+            bbox=BBox(0, 0, 2560, 1440), location=Location(0, 0, 2560, 1440)
+        ),
+        image=Image.open(PROJECT_TEST_DATA / "av_dead.png"),
+    )
+    client.load_sub_images(bundle_path=tmp_path / "templates.bundle")
+    resurrection = client.get_sub_image("resurrection")
+    assert resurrection.image is None
+    assert resurrection.template_gray is None
+
+    client.update_sub_images(update_client_image=False)
+    assert [img.name for img in client.sub_images if img.found] == ["resurrection"]
+
+
+def test_change_gating_settings():
+    """Changing the search settings invalidates the previous result"""
+    client = build_wow_client_from_monitor_image(PROJECT_TEST_DATA / "av_dead.png")
+    resurrection = client.get_sub_image("resurrection")
+
+    resurrection.update_location(client, update_image=False)
+    client.image = client.image.copy()
+    client.hot_region_search = False
+    resurrection.update_location(client, update_image=False)
+    assert resurrection.found
+    assert resurrection.search_stats.gated_skips == 0
@@ -0,0 +1,111 @@
+import pytest
+
+from avbot.lib.inputs import (
+    InputBackend,
+    PyAutoGuiBackend,
+    RecordingBackend,
+    get_input_backend,
+    set_input_backend,
+)
+from avbot.lib.movements import moves, preprocess_movements, adjust_units
+from avbot.lib.utils import move_mouse, perform_keystrokes
+
+
+@pytest.fixture
+def recorder():
+    backend = RecordingBackend()
+    previous = set_input_backend(backend)
+    yield backend
+    set_input_backend(previous)
+
+
+def test_pyautogui_backend_skips_pause(monkeypatch):
+    """Calls are made without pyautogui's implicit pause"""
+    calls = []
+    monkeypatch.setattr(
+        "avbot.lib.inputs.pyautogui.keyDown",
+        lambda key, **kwargs: calls.append(("down", key, kwargs)),
+    )
+    monkeypatch.setattr(
+        "avbot.lib.inputs.pyautogui.keyUp",
+        lambda key, **kwargs: calls.append(("up", key, kwargs)),
+    )
+
+    backend = PyAutoGuiBackend()
+    backend.press("w")
+    assert calls == [("down", "w", {"_pause": False}), ("up", "w", {"_pause": False})]
+    assert backend.stats["key_down"].calls == 1
+    assert not backend.pressed
+
+
+def test_backends_implement_every_primitive():
+    """A backend missing a primitive cannot be created"""
+
+    class KeysOnly(InputBackend):
+        def _key_down(self, key):
+            pass
+
+        def _key_up(self, key):
+            pass
+
+    with pytest.raises(TypeError):
+        KeysOnly()
+
+
+def test_pyautogui_backend_moves_without_pause(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        "avbot.lib.inputs.pyautogui.moveTo",
+        lambda x, y, **kwargs: calls.append((x, y, kwargs)),
+    )
+
+    PyAutoGuiBackend().move_to(10, 20, duration=0.01)
+    assert calls == [(10, 20, {"duration": 0.01, "_pause": False})]
+
+
+def test_move_mouse(recorder):
+    """The cursor glides to its target through the input backend"""
+    move_mouse(200, 100)
+    actions = [event[1] for event in recorder.events]
+    assert 4 <= len(actions) <= 9 and set(actions) == {"move_to"}
+    assert recorder.position() == (200, 100)
+    assert recorder.stats["move_to"].calls == len(actions)
+
+
+def test_default_backend():
+    previous = set_input_backend(None)
+    try:
+        assert isinstance(get_input_backend(), PyAutoGuiBackend)
+    finally:
+        set_input_backend(previous)
+
+
+def test_moves_hold_times(recorder):
+    """Keys are held for the computed times, without added pauses"""
+    movements = [{"units": 2.0, "rotation": 0.0}, {"units": 0.0, "rotation": 0.05}]
+    expected = preprocess_movements(adjust_units(movements))
+
+    assert moves(movements)
+    (forward,) = recorder.hold_times("w")
+    (turn,) = recorder.hold_times("]")
+    assert forward == pytest.approx(expected[0]["execution_time"], abs=0.05)
+    assert turn == pytest.approx(expected[1]["rotation_time"], abs=0.05)
+    assert not recorder.pressed
+    assert recorder.stats["key_down"].max_time < 0.01
+
+
+def test_perform_keystrokes(recorder):
+    keystrokes = [
+        {"time": 0.0, "action": "press", "key": "w"},
+        {"time": 0.1, "action": "press", "key": "a"},
+        {"time": 0.2, "action": "release", "key": "a"},
+        {"time": 0.3, "action": "release", "key": "w"},
+    ]
+    assert perform_keystrokes(keystrokes)
+    assert [event[1:] for event in recorder.events] == [
+        ("key_down", "w"),
+        ("key_down", "a"),
+        ("key_up", "a"),
+        ("key_up", "w"),
+    ]
+    assert recorder.hold_times("w")[0] == pytest.approx(0.3, abs=0.05)
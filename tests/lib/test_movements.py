@@ -1,6 +1,10 @@
+import json
+import threading
 import pytest
 from pathlib import Path
 
+import numpy as np
+
 from PIL import Image
 
 from avbot.lib.screen import WoWclient
@@ -10,7 +14,15 @@ from avbot.lib.movements import (
     move_until_death,
     move_randomly_in_bg,
     mount_up,
+    adjust_units,
+    preprocess_movements,
+    compile_movements,
+    load_movement_plan,
+    stream_movement_timeline,
+    stream_random_movements,
 )
+from avbot.lib.inputs import RecordingBackend, set_input_backend
+from avbot.lib.timeline import CHECKPOINT, KEY_DOWN, KEY_UP, StopEvent
 
 from tests.constructs import build_wow_client_from_monitor_image
 
@@ -18,6 +30,7 @@ PROJECT_ROOT = Path(__file__).parent.parent.parent
 PROJECT_TEST_OUTPUTS = PROJECT_ROOT / "tests" / "outputs"
 PROJECT_TEST_DATA = PROJECT_ROOT / "tests" / "data"
 PACKAGE_DATA = PROJECT_ROOT / "avbot" / "data"
+PACKAGE_MOVEMENTS = PROJECT_ROOT / "avbot" / "movements"
 
 
 def swap_client_image(client: WoWclient, image_name: str):
@@ -81,3 +94,90 @@ def test_move_randomly_in_bg(wow_client):
 def test_mount_up(wow_client):
     wow_client.focus_client()
     mount_up(wow_client)
+
+
+@pytest.mark.parametrize("mounted", [False, True])
+@pytest.mark.parametrize("name", ["move_out_of_cave", "move_to_harpies"])
+def test_compiled_plans_match_preprocessing(name, mounted):
+    """Compiled plans have the segments of the preprocessed movements"""
+    path = PACKAGE_MOVEMENTS / f"{name}.json"
+    plan = load_movement_plan(path, mounted)
+    assert load_movement_plan(path, mounted) is plan
+    assert plan.with_mount(not mounted) is load_movement_plan(path, not mounted)
+
+    with open(path) as f:
+        reference = preprocess_movements(adjust_units(json.load(f), mounted))
+    starts = [event.time for event in plan.timeline() if event.action == CHECKPOINT]
+    expected = np.cumsum([0] + [m["execution_time"] for m in reference])
+    assert starts == pytest.approx(expected[:-1])
+    assert plan.duration == pytest.approx(expected[-1])
+
+
+def test_compiled_plan_events():
+    """Turns longer than the forward run release the forward key, then the turn"""
+    plan = compile_movements(
+        [
+            {"units": 0.5, "rotation": -0.5},
+            {"units": 3.0, "rotation": 0.0},
+            {"units": 0.0, "rotation": 0.1},
+        ]
+    )
+    timeline = list(plan.timeline(move_forward_key="z"))
+    assert [event.time for event in timeline] == sorted(e.time for e in timeline)
+
+    actions = [(event.action, event.key) for event in timeline]
+    assert actions == [
+        (CHECKPOINT, None),
+        (KEY_DOWN, "z"),
+        (KEY_DOWN, "["),
+        (KEY_UP, "z"),
+        (KEY_UP, "["),
+        (CHECKPOINT, None),
+        (KEY_DOWN, "z"),
+        (CHECKPOINT, None),
+        (KEY_UP, "z"),
+        (KEY_DOWN, "]"),
+        (KEY_UP, "]"),
+    ]
+    assert timeline[-1].time == pytest.approx(plan.duration)
+
+
+def test_streamed_timeline_matches_compiled_plan():
+    """Streaming movements one at a time gives the events of the whole plan"""
+    movements = [
+        {"units": 20.0, "rotation": 0.05},
+        {"units": 0.0, "rotation": -0.25},
+        {"units": 10.0, "rotation": 0.0},
+        {"units": 3.0, "rotation": 0.3},
+    ]
+    streamed = list(stream_movement_timeline(iter(movements)))
+    compiled = list(compile_movements(movements).timeline())
+    assert [(event.action, event.key) for event in streamed] == [
+        (event.action, event.key) for event in compiled
+    ]
+    assert [event.time for event in streamed] == pytest.approx(
+        [event.time for event in compiled]
+    )
+
+
+def test_roaming_keeps_moving():
+    """Endless roaming holds the forward key across movements until stopped"""
+    backend = RecordingBackend()
+    previous = set_input_backend(backend)
+    stop_event = StopEvent()
+    timer = threading.Timer(2.0, stop_event.set)
+    timer.start()
+    try:
+        movements = stream_random_movements(
+            None, units_uniform_params=(2, 4), rotation_gaussian_params=(0.0, 0.02)
+        )
+        assert not moves(movements, stop_event=stop_event)
+    finally:
+        timer.join()
+        set_input_backend(previous)
+
+    forward = [event for event in backend.events if event[2] == "w"]
+    assert [event[1] for event in forward if event[1] == KEY_DOWN] == [KEY_DOWN]
+    (hold_time,) = backend.hold_times("w")
+    assert 1.5 < hold_time < 2.1
+    assert not backend.pressed
@@ -0,0 +1,77 @@
+from pathlib import Path
+
+from PIL import Image
+
+from avbot.lib.capture import Frame
+from avbot.lib.probes import PixelProbe, load_probes, save_probes
+from tests.constructs import build_wow_client_from_monitor_image
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+PROJECT_TEST_DATA = PROJECT_ROOT / "tests" / "data"
+
+
+def test_calibrate_and_evaluate_probe(tmp_path):
+    """A probe calibrated on a reference screenshot detects the same state"""
+    client = build_wow_client_from_monitor_image(PROJECT_TEST_DATA / "av_dead.png")
+    probe = client.calibrate_probe("resurrection", frame=client.get_frame())
+    assert probe is not None
+
+    dead_frame = client.get_frame()
+    end_frame = Frame.from_pil(Image.open(PROJECT_TEST_DATA / "av_end.png"))
+    assert probe.evaluate(dead_frame)
+    assert not probe.evaluate(end_frame)
+
+    # Probes survive a round trip to disk
+    probes_path = tmp_path / "probes.json"
+    save_probes(client.probes, probes_path)
+    loaded = load_probes(probes_path)["resurrection"]
+    assert loaded.points == probe.points
+    assert loaded.colors == probe.colors
+    assert loaded.evaluate(dead_frame)
+
+
+def test_detect_escalates_ambiguous_probes():
+    """Ambiguous probes fall back to template matching"""
+    client = build_wow_client_from_monitor_image(PROJECT_TEST_DATA / "av_dead.png")
+    frame = client.get_frame()
+
+    # Corrupt half of the expected colors so the probe is ambiguous
+    probe = client.calibrate_probe("resurrection", frame=frame)
+    probe.colors = [
+        tuple(255 - c for c in color) if i % 2 else color
+        for i, color in enumerate(probe.colors)
+    ]
+    client.probes["resurrection"] = probe
+
+    detected = client.detect(["resurrection", "leave_battleground"], frame=frame)
+    assert detected == {"resurrection": True, "leave_battleground": False}
+    assert probe.stats.escalations == 1
+
+
+def test_probes_sharing_a_template():
+    """Probes without an escalation target escalate to their own template, once"""
+    client = build_wow_client_from_monitor_image(PROJECT_TEST_DATA / "av_dead.png")
+    frame = client.get_frame()
+    data = client.calibrate_probe("resurrection", frame=frame).to_dict()
+    data["escalate_to"] = None
+    ambiguous = PixelProbe.from_dict(data)
+    assert ambiguous.escalate_to == "resurrection"
+    # Corrupt half of the expected colors so the probe is ambiguous
+    ambiguous.colors = [
+        tuple(255 - c for c in color) if i % 2 else color
+        for i, color in enumerate(ambiguous.colors)
+    ]
+    client.probes["resurrection"] = ambiguous
+    client.probes["dead"] = PixelProbe.from_dict(
+        {**ambiguous.to_dict(), "name": "dead"}
+    )
+
+    matched = []
+    match_sub_images = client.match_sub_images
+    client.match_sub_images = lambda names, *args: matched.append(
+        names
+    ) or match_sub_images(names, *args)
+
+    detected = client.detect(["resurrection", "dead"], frame=frame)
+    assert detected == {"resurrection": True, "dead": True}
+    assert matched == [["resurrection"]]
@@ -0,0 +1,122 @@
+from pathlib import Path
+
+from PIL import Image
+
+from avbot.lib.scheduler import APPEAR, DISAPPEAR
+from tests.constructs import build_wow_client_from_monitor_image
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+PROJECT_TEST_DATA = PROJECT_ROOT / "tests" / "data"
+
+
+def test_events_share_one_capture():
+    """Every due detector is evaluated on the same snapshot"""
+    client = build_wow_client_from_monitor_image(PROJECT_TEST_DATA / "av_dead.png")
+    scheduler = client.get_scheduler()
+    # The recorded frame never goes stale
+    scheduler.max_age = float("inf")
+    snapshots = []
+    snapshot = client.snapshot
+    client.snapshot = lambda max_age=None: snapshots.append(max_age) or snapshot(
+        max_age
+    )
+
+    appeared, disappeared = [], []
+    dead = scheduler.subscribe("resurrection", APPEAR, callback=appeared.append)
+    over = scheduler.subscribe(
+        "leave_battleground", APPEAR, priority=1, callback=appeared.append
+    )
+    alive = scheduler.subscribe("resurrection", DISAPPEAR, callback=disappeared.append)
+
+    assert scheduler.tick() == 2
+    assert len(snapshots) == 1
+    assert dead.flag.is_set() and not over.flag.is_set()
+    assert appeared == ["resurrection"]
+    assert scheduler.is_visible("resurrection")
+
+    # Nothing is due before the interval elapsed
+    assert scheduler.tick() == 0
+    assert len(snapshots) == 1
+
+    # Events only fire on transitions
+    scheduler.check(["resurrection", "leave_battleground"])
+    assert appeared == ["resurrection"]
+
+    client.image = Image.open(PROJECT_TEST_DATA / "av_end.png")
+    scheduler.check(["resurrection", "leave_battleground"])
+    assert appeared == ["resurrection", "leave_battleground"]
+    assert disappeared == ["resurrection"]
+    assert over.flag.is_set() and alive.flag.is_set()
+
+    for subscription in [dead, over, alive]:
+        scheduler.unsubscribe(subscription)
+    assert scheduler.next_wakeup() is None
+
+
+def test_wait_for():
+    """Waits are driven by the caller, or by the scheduler thread when it runs"""
+    client = build_wow_client_from_monitor_image(PROJECT_TEST_DATA / "av_dead.png")
+    scheduler = client.get_scheduler()
+    # The recorded frame never goes stale
+    scheduler.max_age = float("inf")
+
+    assert scheduler.wait_for("resurrection", APPEAR, timeout=1.0)
+    assert not scheduler.wait_for("leave_battleground", APPEAR, timeout=0.3)
+
+    scheduler.start()
+    try:
+        assert scheduler.running
+        assert scheduler.wait_for(
+            "cancel_res", APPEAR, timeout=1.0, interval=0.05, threshold=0.75
+        )
+        # The thread stops with its last subscription, the caller polls again
+        assert not scheduler.running
+        assert not scheduler.wait_for(
+            "resurrection", DISAPPEAR, timeout=0.3, interval=0.05
+        )
+    finally:
+        client.close()
+    assert not scheduler.running
+
+
+def test_priority_short_circuits():
+    """Lower priorities wait for the next tick when a higher one fires"""
+    client = build_wow_client_from_monitor_image(PROJECT_TEST_DATA / "av_end.png")
+    scheduler = client.get_scheduler()
+    # The recorded frame never goes stale
+    scheduler.max_age = float("inf")
+
+    fired = []
+    alive = scheduler.subscribe("resurrection", DISAPPEAR, callback=fired.append)
+    over = scheduler.subscribe(
+        "leave_battleground", APPEAR, priority=1, callback=fired.append
+    )
+
+    assert scheduler.tick() == 1
+    assert fired == ["leave_battleground"]
+    assert scheduler.is_visible("resurrection") is None
+
+    assert scheduler.tick() == 1
+    assert fired == ["leave_battleground", "resurrection"]
+    assert alive.flag.is_set() and over.flag.is_set()
+
+
+def test_unsubscribe_from_callback():
+    """Subscriptions removed while a tick runs do not break the tick"""
+    client = build_wow_client_from_monitor_image(PROJECT_TEST_DATA / "av_dead.png")
+    scheduler = client.get_scheduler()
+    # The recorded frame never goes stale
+    scheduler.max_age = float("inf")
+
+    subscriptions = []
+    subscriptions.append(
+        scheduler.subscribe(
+            "resurrection",
+            APPEAR,
+            callback=lambda name: scheduler.unsubscribe(subscriptions[0]),
+        )
+    )
+
+    assert scheduler.tick() == 1
+    assert subscriptions[0].flag.is_set()
+    assert scheduler.next_wakeup() is None
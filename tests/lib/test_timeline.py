@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+
+from avbot.constants import TIMELINE_JITTER_SAMPLES
+from avbot.lib.inputs import RecordingBackend
+from avbot.lib.timeline import (
+    CHECKPOINT,
+    KEY_DOWN,
+    KEY_UP,
+    StopEvent,
+    TimelineEvent,
+    TimelineExecutor,
+    TimelineStats,
+)
+
+
+def test_events_run_at_deadlines():
+    """Events are sent at their absolute deadline, lateness is recorded"""
+    backend = RecordingBackend()
+    executor = TimelineExecutor(backend)
+    events = [TimelineEvent(0.02 * i, KEY_DOWN, str(i)) for i in range(10)]
+
+    assert executor.run(events)
+    start = backend.events[0][0]
+    for (timestamp, _, _), event in zip(backend.events, events):
+        assert timestamp - start == pytest.approx(event.time, abs=0.01)
+
+    assert executor.stats.events == 10
+    assert 0 <= executor.stats.mean_jitter <= executor.stats.max_jitter < 0.01
+    assert "p95" in repr(executor.stats)
+
+
+def test_stats_are_bounded():
+    """Long sessions keep running totals and a bounded window of jitters"""
+    stats = TimelineStats()
+    for i in range(3 * TIMELINE_JITTER_SAMPLES):
+        stats.add_jitter(0.001 * (i % 3))
+
+    assert stats.events == 3 * TIMELINE_JITTER_SAMPLES
+    assert len(stats.recent_jitters) == TIMELINE_JITTER_SAMPLES
+    assert stats.mean_jitter == pytest.approx(0.001)
+    assert stats.max_jitter == pytest.approx(0.002)
+
+
+def test_stop_releases_keys():
+    """A stop event ends the run and releases the keys held, plain events work too"""
+    backend = RecordingBackend()
+    executor = TimelineExecutor(backend)
+    stop_event = threading.Event()
+    timer = threading.Timer(0.05, stop_event.set)
+    timer.start()
+
+    events = [
+        TimelineEvent(0.0, KEY_DOWN, "w"),
+        TimelineEvent(0.1, CHECKPOINT),
+        TimelineEvent(0.2, KEY_DOWN, "]"),
+        TimelineEvent(0.3, KEY_UP, "w"),
+    ]
+    assert not executor.run(events, stop_event)
+    timer.join()
+    assert [event[1:] for event in backend.events] == [
+        (KEY_DOWN, "w"),
+        (KEY_UP, "w"),
+    ]
+    assert backend.events[1][0] - backend.events[0][0] == pytest.approx(0.05, abs=0.03)
+
+
+def test_waits_are_interruptible():
+    """A stop in the middle of a long hold releases the keys right away"""
+    backend = RecordingBackend()
+    executor = TimelineExecutor(backend)
+    stop_event = StopEvent()
+    timer = threading.Timer(0.05, stop_event.set)
+    timer.start()
+
+    events = [
+        TimelineEvent(0.0, KEY_DOWN, "w"),
+        TimelineEvent(0.0, KEY_DOWN, "]"),
+        TimelineEvent(2.0, KEY_UP, "]"),
+        TimelineEvent(2.0, KEY_UP, "w"),
+    ]
+    assert not executor.run(events, stop_event)
+    timer.join()
+
+    released_at = max(timestamp for timestamp, _, _ in backend.events)
+    assert released_at - backend.events[0][0] < 0.1
+    assert sorted(event[2] for event in backend.events[2:]) == ["]", "w"]
+    assert executor.stats.stops == 1
+    assert executor.stats.max_stop_latency < 0.1
+
+    stop_event.clear()
+    assert stop_event.set_at is None
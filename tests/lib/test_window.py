@@ -0,0 +1,125 @@
+from dataclasses import dataclass
+from typing import Tuple
+
+import pytest
+
+from avbot.lib.exceptions import WoWnotFoundException
+from avbot.lib.screen import Monitor, WoWclient
+from avbot.lib.utils import BBox, Location
+from avbot.lib.window import WoWcoordinates
+
+
+@dataclass
+class FakeProcess:
+    name: str
+    pid: int = 1234
+    running: bool = True
+
+    @property
+    def info(self) -> dict:
+        return {"name": self.name}
+
+    def is_running(self) -> bool:
+        return self.running
+
+
+@dataclass
+class FakeWindow:
+    title: str = "World of Warcraft"
+    box: Tuple[int, int, int, int] = (0, 0, 2560, 1440)
+    isActive: bool = False
+    activations: int = 0
+
+    def activate(self):
+        self.activations += 1
+        self.isActive = True
+
+
+@pytest.fixture
+def system(monkeypatch):
+    """A fake WoW process and window, counting system-wide lookups"""
+    state = {
+        "process": FakeProcess("WowClassic.exe"),
+        "window": FakeWindow(),
+        "window_scans": 0,
+    }
+
+    def process_iter(attrs=None):
+        return [FakeProcess("explorer.exe", pid=1), state["process"]]
+
+    def get_windows_with_title(title):
+        state["window_scans"] += 1
+        window = state["window"]
+        return [window] if window and title in window.title else []
+
+    monkeypatch.setattr("avbot.lib.window.psutil.process_iter", process_iter)
+    monkeypatch.setattr(
+        "avbot.lib.window.gw.getWindowsWithTitle", get_windows_with_title
+    )
+    monkeypatch.setattr("avbot.lib.window.time.sleep", lambda seconds: None)
+    return state
+
+
+def test_discovery_is_cached(system):
+    """The process and window are only scanned for once, until they disappear"""
+    wow_coordinates = WoWcoordinates()
+    assert wow_coordinates.update_coordinates()
+    assert not wow_coordinates.update_coordinates()
+    wow_coordinates.focus()
+    wow_coordinates.focus()
+    assert wow_coordinates.pid == 1234
+    assert wow_coordinates.scans == 1
+    assert system["window_scans"] == 1
+    assert system["window"].activations == 1
+
+    # The game restarts
+    system["process"].running = False
+    system["process"] = FakeProcess("WowClassic.exe", pid=5678)
+    system["window"] = FakeWindow(box=(0, 0, 1920, 1080))
+    assert wow_coordinates.update_coordinates()
+    assert wow_coordinates.pid == 5678
+    assert wow_coordinates.bbox.width == 1920
+    assert wow_coordinates.scans == 2
+
+    # The game closes
+    system["process"].running = False
+    system["process"] = FakeProcess("notepad.exe")
+    with pytest.raises(WoWnotFoundException):
+        wow_coordinates.update_coordinates()
+
+
+def test_window_moves_are_followed(system, tmp_path, monkeypatch):
+    """Moves update the client location in place, resizes rescale the templates"""
+    monkeypatch.setattr("avbot.lib.templates.TEMPLATE_CACHE_DIR", tmp_path)
+    wow_coordinates = WoWcoordinates()
+    wow_coordinates.update_coordinates()
+    client = WoWclient(
+        wow_coordinates=wow_coordinates,
+        monitor=Monitor(
+            name="DISPLAY1",
+            number=1,
+            bbox=BBox(0, 0, 2560, 1440),
+            location=Location(0, 0, 2560, 1440),
+        ),
+        monitor_relative_location=Location(0, 0, 2560, 1440),
+    )
+    client.load_sub_images()
+    resurrection = client.get_sub_image("resurrection")
+
+    assert not client.check_window(force=True)
+
+    system["window"].box = (100, 50, 2000, 1000)
+    assert client.check_window(force=True)
+    assert client.monitor_relative_location == Location(100, 50, 2100, 1050)
+    assert resurrection.scale != 1.0
+
+    system["window"].box = (200, 100, 2000, 1000)
+    scale = resurrection.scale
+    assert client.check_window(force=True)
+    assert client.monitor_relative_location == Location(200, 100, 2200, 1100)
+    assert resurrection.scale == scale
+
+    # Checks are throttled
+    system["window"].box = (0, 0, 2560, 1440)
+    assert not client.check_window()
+    assert wow_coordinates.scans == 1